@@ -0,0 +1,84 @@
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.data_processing import load_data, clean_data
+
+def clean_data_chained(df):
+    # The previous implementation: in-place dropna/drop_duplicates on the
+    # caller's frame, then one full-frame copy per filter.
+    df.dropna(subset=['CustomerID'], inplace=True)
+    df.drop_duplicates(inplace=True)
+    df = df[~df['InvoiceNo'].str.startswith('C')]
+    df = df[~df['StockCode'].str.contains('^[a-zA-Z]', regex=True)]
+    df = df[~((df['Description'] == 'Next Day Carriage') | (df['Description'] == 'High Resolution Image'))]
+    df = df[df['UnitPrice'] > 0]
+    df["TotalPrice"] = df["Quantity"] * df["UnitPrice"]
+    return df
+
+IMPLEMENTATIONS = {'chained': clean_data_chained, 'single_mask': clean_data}
+
+def current_rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+class RssSampler:
+    # Polls the resident set size while a stage runs; ru_maxrss would also
+    # count the CSV parsing peak that happened before it.
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            self.peak = max(self.peak, current_rss_mb())
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        return max(self.peak, current_rss_mb())
+
+def measure(path, implementation):
+    warnings.simplefilter('ignore')
+    df = load_data(path)
+    rows_in = len(df)
+    before = current_rss_mb()
+    sampler = RssSampler()
+    start = time.perf_counter()
+    clean = IMPLEMENTATIONS[implementation](df)
+    elapsed = time.perf_counter() - start
+    peak = sampler.stop()
+    print(f"{implementation:<12} {rows_in:>12,} {len(clean):>12,} {elapsed:>9.2f} {before:>12,.0f} {peak:>11,.0f} {peak - before:>13,.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak memory and time of clean_data against the chained-filter implementation.")
+    parser.add_argument("--data", help="Transactions CSV; generated with synthetic_data.py if missing")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--implementation", choices=list(IMPLEMENTATIONS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.implementation:
+        measure(args.data, args.implementation)
+        sys.exit(0)
+
+    path = args.data or os.path.join("data", f"synthetic-{args.rows}.csv")
+    if not os.path.exists(path):
+        from synthetic_data import write_transactions_chunked
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        write_transactions_chunked(path, args.rows, args.customers)
+
+    print(f"{'':<12} {'rows in':>12} {'rows out':>12} {'time (s)':>9} {'RSS in (MB)':>12} {'peak (MB)':>11} {'added (MB)':>13}")
+    # Each implementation runs in a fresh process so neither inherits the
+    # other's heap.
+    for implementation in IMPLEMENTATIONS:
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--data", path, "--implementation", implementation], check=True)
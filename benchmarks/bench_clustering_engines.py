@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from sklearn.metrics import adjusted_rand_score, silhouette_score
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bench_prediction import make_rfm
+from utils.clustering import ENGINES, perform_clustering, scale_rfm
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quality vs time of the clustering engines against full KMeans.")
+    parser.add_argument("--customers", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--n-clusters", type=int, default=4)
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    parser.add_argument("--silhouette-sample", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"{'customers':>10} {'engine':>10} {'fit (s)':>9} {'inertia vs kmeans':>18} {'ARI vs kmeans':>14} {'silhouette':>11}")
+    for n_customers in args.customers:
+        rfm = pd.DataFrame(np.log1p(make_rfm(n_customers)), columns=['Recency', 'Frequency', 'Monetary'])
+        X = scale_rfm(rfm)[0].to_numpy()
+        reference = None
+        for engine in ENGINES:
+            start = time.perf_counter()
+            clustered, model, scaler, _ = perform_clustering(rfm, n_clusters=args.n_clusters, engine=engine, chunksize=args.chunksize)
+            elapsed = time.perf_counter() - start
+            labels = clustered['Cluster'].to_numpy()
+            # Score every engine on the same full-table scaling.
+            centers = np.vstack([X[labels == c].mean(axis=0) for c in range(args.n_clusters)])
+            inertia = ((X - centers[labels]) ** 2).sum()
+            if reference is None:
+                reference = (inertia, labels)
+            silhouette = silhouette_score(X, labels, sample_size=min(args.silhouette_sample, len(X)), random_state=42)
+            print(f"{n_customers:>10,} {engine:>10} {elapsed:>9.2f} {inertia / reference[0]:>18.4f} "
+                  f"{adjusted_rand_score(reference[1], labels):>14.3f} {silhouette:>11.3f}")
@@ -0,0 +1,76 @@
+import argparse
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+# Each scenario runs in a fresh interpreter and prints the seconds from its
+# first import to its first prediction.
+SCENARIOS = {
+    'eager imports (previous prediction.py)': """
+import numpy, pandas, sklearn.preprocessing, sklearn.cluster, pickle, utils.clustering
+""",
+    'import prediction': """
+import prediction
+""",
+    'pickles: load + first prediction': """
+import prediction
+predictor = prediction.CustomerSegmentationPredictor()
+predictor.load_models(MODELS_DIR, use_bundle=False)
+predictor.predict_segment(30, 5, 200)
+""",
+    'bundle: load + first prediction': """
+import prediction
+predictor = prediction.CustomerSegmentationPredictor()
+predictor.load_models(MODELS_DIR)
+predictor.predict_segment(30, 5, 200)
+""",
+    'compiled_model: load + first prediction': """
+from compiled_model import CompiledSegmentationPredictor
+CompiledSegmentationPredictor(MODELS_DIR + "/segmentation_model.bundle").predict_segment(30, 5, 200)
+""",
+}
+
+def write_models(models_dir):
+    from bench_prediction import fit_predictor
+    from compiled_model import export_compiled_model
+    predictor = fit_predictor()
+    for name, obj in [('kmeans_model', predictor.kmeans_model), ('scaler', predictor.scaler), ('cluster_labels', predictor.cluster_labels)]:
+        with open(os.path.join(models_dir, f"{name}.pkl"), "wb") as f:
+            pickle.dump(obj, f)
+    export_compiled_model(predictor.kmeans_model, predictor.scaler, predictor.cluster_labels,
+                          os.path.join(models_dir, "segmentation_model.bundle"))
+
+def run_scenario(code, models_dir):
+    script = (f"import sys, time, io, contextlib\nstart = time.perf_counter()\nsys.path.insert(0, {ROOT!r})\n"
+              f"MODELS_DIR = {models_dir!r}\nwith contextlib.redirect_stdout(io.StringIO()):\n"
+              + "".join(f"    {line}\n" for line in code.strip().splitlines())
+              + "print(time.perf_counter() - start)\n")
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    return float(output.split()[-1]), time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time and cold-start latency of the prediction entry points.")
+    parser.add_argument("--models-dir", help="Directory with the pickles and model bundle (default: fit a small model)")
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        models_dir = args.models_dir
+        if models_dir is None:
+            models_dir = tmp
+            write_models(models_dir)
+        run_scenario("import numpy", models_dir)  # warm the OS file cache
+
+        print(f"{'scenario':<42} {'in-process (ms)':>16} {'process wall (ms)':>18}")
+        for name, code in SCENARIOS.items():
+            timings = np.array([run_scenario(code, models_dir) for _ in range(args.repeat)])
+            in_process, wall = np.median(timings, axis=0) * 1000
+            print(f"{name:<42} {in_process:>16.1f} {wall:>18.1f}")
@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bench_prediction import fit_predictor, make_rfm
+from compiled_model import CompiledSegmentationPredictor, export_compiled_model
+
+def per_call(func, rows):
+    start = time.perf_counter()
+    for row in rows:
+        func(*row)
+    return (time.perf_counter() - start) / len(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of the sklearn predictor vs the compiled NumPy artifact.")
+    parser.add_argument("--calls", type=int, default=2_000, help="Single-customer calls timed per predictor")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    predictor = fit_predictor()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "segmentation_model.bundle")
+        export_compiled_model(predictor.kmeans_model, predictor.scaler, predictor.cluster_labels, path)
+        compiled = CompiledSegmentationPredictor(path)
+
+    sample = make_rfm(args.calls, seed=1)
+    assert [compiled.predict_segment(*row) for row in sample] == [predictor.predict_segment(*row) for row in sample]
+    sklearn_call = per_call(predictor.predict_segment, sample)
+    compiled_call = per_call(compiled.predict_segment, sample)
+    print(f"single call  sklearn: {sklearn_call * 1e6:8.1f} us   compiled: {compiled_call * 1e6:6.2f} us   ({sklearn_call / compiled_call:.0f}x)")
+
+    print(f"{'rows':>10} {'sklearn batch (s)':>18} {'compiled batch (s)':>19} {'speedup':>8}")
+    for n_rows in args.rows:
+        rfm = make_rfm(n_rows, seed=2)
+        start = time.perf_counter()
+        _, expected = predictor.predict_segments(rfm)
+        sklearn_batch = time.perf_counter() - start
+        start = time.perf_counter()
+        _, labels = compiled.predict_segments(rfm)
+        compiled_batch = time.perf_counter() - start
+        assert (labels == expected).all()
+        print(f"{n_rows:>10,} {sklearn_batch:>18.4f} {compiled_batch:>19.4f} {sklearn_batch / compiled_batch:>7.1f}x")
@@ -0,0 +1,69 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bench_prediction import fit_predictor, make_rfm
+from compiled_model import CompiledSegmentationPredictor, export_compiled_model
+from drift import DriftMonitor, reference_profile
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def observe_threads(monitor, compiled, batches, n_threads):
+    def work():
+        for batch in batches:
+            clusters, distances, _ = compiled.score(batch)
+            monitor.observe(batch, clusters, distances)
+    threads = [threading.Thread(target=work) for _ in range(n_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cost of distance/margin scoring and of the drift accumulator.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--batch-size", type=int, default=256, help="Rows per observed batch in the threaded run")
+    parser.add_argument("--batches", type=int, default=2_000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    predictor = fit_predictor()
+    train = np.log1p(make_rfm(20_000, seed=0))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "segmentation_model.bundle")
+        reference = reference_profile(train, predictor.scaler.mean_, predictor.scaler.scale_, predictor.kmeans_model.cluster_centers_)
+        export_compiled_model(predictor.kmeans_model, predictor.scaler, predictor.cluster_labels, path, reference=reference)
+        compiled = CompiledSegmentationPredictor(path)
+
+    print(f"{'rows':>10} {'predict_clusters (ms)':>22} {'score (ms)':>11} {'+ observe (ms)':>15}")
+    for n_rows in args.rows:
+        rfm = make_rfm(n_rows, seed=2)
+        clusters, distances, _ = compiled.score(rfm)
+        assert (clusters == compiled.predict_clusters(rfm)).all()
+        assert (clusters == predictor.predict_clusters(rfm)).all()
+        monitor = DriftMonitor(compiled.reference)
+        predict = best_of(lambda: compiled.predict_clusters(rfm))
+        score = best_of(lambda: compiled.score(rfm))
+        observe = best_of(lambda: monitor.observe(rfm, clusters, distances))
+        print(f"{n_rows:>10,} {predict * 1000:>22.2f} {score * 1000:>11.2f} {observe * 1000:>15.2f}")
+
+    batches = [make_rfm(args.batch_size, seed=3 + i) for i in range(args.batches // args.threads)]
+    monitor = DriftMonitor(compiled.reference)
+    elapsed = observe_threads(monitor, compiled, batches, args.threads)
+    report = monitor.report()
+    assert report['n'] == len(batches) * args.batch_size * args.threads
+    print(f"\n{args.threads} threads x {len(batches)} batches of {args.batch_size}: "
+          f"{report['n'] / elapsed:,.0f} rows/s scored and observed, {report['n']:,} rows counted, drifted={report['drifted']}")
@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.data_processing import load_data, clean_data, aggregate_customers
+from utils.multi_file import resolve_sources, aggregate_customers_files
+
+def load_clean_aggregate(paths):
+    # What one process does today: read every file, clean, aggregate.
+    df = pd.concat([load_data(path) for path in paths], ignore_index=True)
+    return aggregate_customers(clean_data(df))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipelined multi-file ingestion against sequential baselines.")
+    parser.add_argument("--data", nargs="+", help="Transaction CSVs or globs; monthly synthetic files are generated if omitted")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--files", type=int, default=24)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--max-pending", type=int, help="Parsed ranges allowed in flight (default: 2 x jobs)")
+    args = parser.parse_args()
+
+    if args.data:
+        paths = resolve_sources(args.data)
+    else:
+        directory = os.path.join("data", f"monthly-{args.rows}-{args.files}")
+        paths = resolve_sources(os.path.join(directory, "invoices-*.csv")) if os.path.isdir(directory) else []
+        if len(paths) != args.files:
+            from synthetic_data import write_transactions_monthly
+            paths = write_transactions_monthly(directory, args.rows, args.customers, args.files)
+    size_mb = sum(os.path.getsize(path) for path in paths) / 2**20
+    print(f"{len(paths)} files, {size_mb:,.0f} MB")
+
+    start = time.perf_counter()
+    expected = load_clean_aggregate(paths)
+    serial = time.perf_counter() - start
+
+    stats = {}
+    start = time.perf_counter()
+    baseline = aggregate_customers_files(paths, sequential=True, stats=stats)
+    sequential = time.perf_counter() - start
+    pd.testing.assert_frame_equal(expected, baseline, check_exact=False, rtol=1e-12)
+
+    print(f"{'run':<22} {'wall (s)':>9} {'vs sequential':>14} {'parse (s)':>10} {'aggregate (s)':>14} {'wait (s)':>9}")
+    print(f"{'load_data + clean':<22} {serial:>9.2f} {sequential / serial:>13.2f}x")
+    print(f"{'sequential':<22} {sequential:>9.2f} {1:>13.2f}x {stats['parse_s']:>10.2f} {stats['aggregate_s']:>14.2f}")
+    for jobs in args.jobs:
+        if jobs > (os.cpu_count() or 1):
+            print(f"{f'pipelined, {jobs} jobs':<22} skipped: only {os.cpu_count()} cores")
+            continue
+        stats = {}
+        start = time.perf_counter()
+        result = aggregate_customers_files(paths, jobs=jobs, max_pending=args.max_pending, stats=stats)
+        elapsed = time.perf_counter() - start
+        pd.testing.assert_frame_equal(baseline, result, check_exact=True)
+        print(f"{f'pipelined, {jobs} jobs':<22} {elapsed:>9.2f} {sequential / elapsed:>13.2f}x {stats['parse_s']:>10.2f} "
+              f"{stats['aggregate_s']:>14.2f} {stats['wait_s']:>9.2f}")
@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.output_store import OutputStore, write_output_store
+from utils.rfm_analysis import SEGMENTS
+
+def synthetic_clustered(n_customers, n_clusters=4, seed=42):
+    rng = np.random.default_rng(seed)
+    scores = rng.integers(1, 6, size=(n_customers, 3))
+    cluster = rng.integers(0, n_clusters, size=n_customers)
+    return pd.DataFrame({
+        'CustomerID': np.arange(10000, 10000 + n_customers, dtype=np.float64),
+        'Recency': rng.normal(3, 1, n_customers),
+        'Frequency': rng.normal(4, 1, n_customers),
+        'Monetary': rng.normal(7, 1, n_customers),
+        'recency_score': scores[:, 0],
+        'frequency_score': scores[:, 1],
+        'monetary_score': scores[:, 2],
+        'RFM_SCORE': scores[:, 0] * 10 + scores[:, 1],
+        'segment': np.array(SEGMENTS)[rng.integers(0, len(SEGMENTS), n_customers)],
+        'Cluster': cluster,
+        'Cluster_Labels': np.array(['Champions', 'Loyal Customers', 'At Risk', 'Lost'])[cluster % 4],
+    })
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Customer lookup and segment scan: clustered_segments.csv vs the SQLite output store.")
+    parser.add_argument("--clustered", help="An existing clustered_segments.csv (default: synthetic customers)")
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rfm_clustered = pd.read_csv(args.clustered, index_col=0) if args.clustered else synthetic_clustered(args.customers)
+    ids = rfm_clustered['CustomerID'].sample(args.lookups, replace=True, random_state=0).to_numpy()
+    segment = rfm_clustered['segment'].iloc[0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "clustered_segments.csv")
+        store_path = os.path.join(tmp, "segments.sqlite")
+        start = time.perf_counter()
+        rfm_clustered.to_csv(csv_path)
+        csv_write = time.perf_counter() - start
+        start = time.perf_counter()
+        write_output_store(rfm_clustered, store_path)
+        store_write = time.perf_counter() - start
+
+        def csv_lookup():
+            df = pd.read_csv(csv_path, index_col=0)
+            return df[df['CustomerID'] == ids[0]]
+
+        def csv_scan():
+            df = pd.read_csv(csv_path, index_col=0)
+            return df[df['segment'] == segment]
+
+        with OutputStore(store_path) as store:
+            start = time.perf_counter()
+            for customer_id in ids:
+                store.customer(customer_id)
+            store_lookup = (time.perf_counter() - start) / len(ids) * 1000
+            assert store.customer(ids[0])['segment'] == csv_lookup()['segment'].iloc[0]
+            store_scan = timed(lambda: store.segment(segment), args.repeat)
+            assert len(store.segment(segment)) == len(csv_scan())
+
+        print(f"{len(rfm_clustered):,} customers")
+        print(f"{'':<30} {'CSV':>12} {'store':>12}")
+        print(f"{'write (s)':<30} {csv_write:>12.2f} {store_write:>12.2f}")
+        print(f"{'file size (MB)':<30} {os.path.getsize(csv_path) / 2**20:>12.1f} {os.path.getsize(store_path) / 2**20:>12.1f}")
+        print(f"{'point lookup (ms)':<30} {timed(csv_lookup, args.repeat):>12.3f} {store_lookup:>12.3f}")
+        print(f"{f'scan {segment!r} (ms)':<30} {timed(csv_scan, args.repeat):>12.1f} {store_scan:>12.1f}")
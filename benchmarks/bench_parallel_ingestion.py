@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.data_processing import load_data, clean_data, aggregate_customers
+from utils.parallel import aggregate_customers_parallel
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serial vs CustomerID-sharded parallel ingestion (load, clean, aggregate).")
+    parser.add_argument("--data", help="Transactions CSV; generated with synthetic_data.py if missing")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    path = args.data or os.path.join("data", f"synthetic-{args.rows}.csv")
+    if not os.path.exists(path):
+        from synthetic_data import write_transactions_chunked
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        write_transactions_chunked(path, args.rows, args.customers)
+
+    start = time.perf_counter()
+    expected = aggregate_customers(clean_data(load_data(path)))
+    serial = time.perf_counter() - start
+    print(f"{'jobs':>6} {'time (s)':>9} {'speedup':>9} {'efficiency':>11}")
+    print(f"{'serial':>6} {serial:>9.2f} {1:>8.2f}x {'':>11}")
+    for jobs in args.jobs:
+        if jobs > (os.cpu_count() or 1):
+            print(f"{jobs:>6} skipped: only {os.cpu_count()} cores")
+            continue
+        start = time.perf_counter()
+        result = aggregate_customers_parallel(path, n_jobs=jobs)
+        elapsed = time.perf_counter() - start
+        pd.testing.assert_frame_equal(expected, result, check_exact=True)
+        print(f"{jobs:>6} {elapsed:>9.2f} {serial / elapsed:>8.2f}x {serial / elapsed / jobs:>10.0%}")
@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from prediction import CustomerSegmentationPredictor, FEATURES
+
+def make_rfm(n_customers, seed=42):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(1, 374, n_customers),
+        rng.geometric(0.05, n_customers),
+        rng.lognormal(6.5, 1.2, n_customers),
+    ]).astype(np.float64)
+
+def fit_predictor(n_customers=20_000):
+    features = pd.DataFrame(np.log1p(make_rfm(n_customers, seed=0)), columns=FEATURES)
+    scaler = StandardScaler().fit(features)
+    kmeans = KMeans(n_clusters=4, random_state=42).fit(scaler.transform(features))
+    return CustomerSegmentationPredictor(kmeans_model=kmeans, scaler=scaler)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of per-row vs batch segment prediction.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--single-rows", type=int, default=2_000, help="Rows timed on the per-row path")
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    predictor = fit_predictor()
+    sample = make_rfm(args.single_rows, seed=1)
+    start = time.perf_counter()
+    single = [predictor.predict_segment(*row) for row in sample]
+    per_row = (time.perf_counter() - start) / len(sample)
+    _, batch_labels = predictor.predict_segments(sample)
+    assert list(batch_labels) == single
+    print(f"per-row predict_segment: {per_row * 1e6:.1f} us/row, {1 / per_row:,.0f} rows/s")
+
+    print(f"{'rows':>12} {'predict_segments (s)':>21} {'rows/s':>14} {'predict_chunks (s)':>19} {'vs per-row':>11}")
+    for n_rows in args.rows:
+        rfm = make_rfm(n_rows, seed=2)
+        start = time.perf_counter()
+        predictor.predict_segments(rfm)
+        batch = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in predictor.predict_chunks(rfm, chunksize=args.chunksize):
+            pass
+        chunked = time.perf_counter() - start
+        print(f"{n_rows:>12,} {batch:>21.3f} {n_rows / batch:>14,.0f} {chunked:>19.3f} {per_row * n_rows / batch:>10.0f}x")
@@ -0,0 +1,40 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.quantile_sketch import QuantileSketch
+
+QUANTILES = np.array([0.2, 0.25, 0.4, 0.6, 0.75, 0.8])
+
+def sketch_quantiles(values, epsilon, n_chunks):
+    # One sketch per chunk, merged at the end as separate workers would be.
+    sketches = [QuantileSketch(epsilon, seed=i).update(chunk) for i, chunk in enumerate(np.array_split(values, n_chunks))]
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged.merge(sketch)
+    return merged.quantile(QUANTILES), sum(len(level) for level in merged.levels)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and rank error of merged quantile sketches against exact np.quantile.")
+    parser.add_argument("--customers", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--epsilon", type=float, nargs="+", default=[0.01, 0.001])
+    parser.add_argument("--chunks", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'customers':>12} {'epsilon':>8} {'exact (s)':>10} {'sketch (s)':>11} {'items kept':>11} {'max rank error':>15}")
+    for n_customers in args.customers:
+        values = np.log1p(np.random.default_rng(42).lognormal(6.5, 1.2, n_customers))
+        start = time.perf_counter()
+        np.quantile(values, QUANTILES)
+        exact = time.perf_counter() - start
+        ordered = np.sort(values)
+        for epsilon in args.epsilon:
+            start = time.perf_counter()
+            estimate, kept = sketch_quantiles(values, epsilon, args.chunks)
+            sketched = time.perf_counter() - start
+            rank_error = np.abs(np.searchsorted(ordered, estimate) / n_customers - QUANTILES).max()
+            print(f"{n_customers:>12,} {epsilon:>8} {exact:>10.3f} {sketched:>11.3f} {kept:>11,} {rank_error:>15.5f}")
+        del values, ordered
@@ -0,0 +1,56 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.rfm_analysis import SEGMENT_MAP, calculate_rfm_scores, segment_customers
+
+def score_and_segment_qcut(rfm):
+    # The previous implementation: qcut per column, a string RFM_SCORE and a
+    # regex replace over every customer.
+    rfm["recency_score"] = pd.qcut(rfm['Recency'], 5, labels=[5, 4, 3, 2, 1])
+    rfm["frequency_score"] = pd.qcut(rfm['Frequency'].rank(method="first"), 5, labels=[1, 2, 3, 4, 5])
+    rfm["monetary_score"] = pd.qcut(rfm['Monetary'], 5, labels=[1, 2, 3, 4, 5])
+    rfm["RFM_SCORE"] = (rfm['recency_score'].astype(str) + rfm['frequency_score'].astype(str))
+    rfm['segment'] = rfm['RFM_SCORE'].replace(SEGMENT_MAP, regex=True)
+    rfm.reset_index(inplace=True)
+    return rfm
+
+def score_and_segment_lookup(rfm):
+    return segment_customers(calculate_rfm_scores(rfm))
+
+def make_rfm(n_customers, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Recency': rng.integers(1, 374, n_customers),
+        'Frequency': rng.geometric(0.05, n_customers),
+        'Monetary': rng.lognormal(6.5, 1.2, n_customers),
+    })
+
+def best_of(func, rfm, repeat):
+    timings = []
+    for _ in range(repeat):
+        frame = rfm.copy()
+        start = time.perf_counter()
+        result = func(frame)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark RFM scoring and segmentation against the qcut/regex implementation.")
+    parser.add_argument("--customers", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'customers':>12} {'qcut + regex (s)':>18} {'lookup (s)':>12} {'speedup':>9}")
+    for n_customers in args.customers:
+        rfm = make_rfm(n_customers)
+        baseline, expected = best_of(score_and_segment_qcut, rfm, args.repeat)
+        lookup, result = best_of(score_and_segment_lookup, rfm, args.repeat)
+        for col in ['recency_score', 'frequency_score', 'monetary_score']:
+            pd.testing.assert_series_equal(expected[col], result[col])
+        assert (expected['segment'] == result['segment'].astype(str)).all()
+        print(f"{n_customers:>12,} {baseline:>18.3f} {lookup:>12.3f} {baseline / lookup:>8.2f}x")
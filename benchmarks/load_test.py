@@ -0,0 +1,59 @@
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlparse
+import numpy as np
+
+def worker(url, n_requests, batch_size, rows, latencies, errors):
+    target = urlparse(url)
+    conn = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+    rng = np.random.default_rng()
+    headers = {"Content-Type": "application/json"}
+    for _ in range(n_requests):
+        picked = rows[rng.integers(0, len(rows), max(batch_size, 1))]
+        if batch_size:
+            path, body = "/predict/batch", {'customers': picked.tolist()}
+        else:
+            path, body = "/predict", dict(zip(['recency', 'frequency', 'monetary'], picked[0].tolist()))
+        start = time.perf_counter()
+        try:
+            conn.request("POST", path, json.dumps(body), headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test for serving.py: p50/p99 latency and requests/sec.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=2_000, help="Requests per concurrency level")
+    parser.add_argument("--batch-size", type=int, default=0, help="Customers per request; 0 uses the single /predict endpoint")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    rows = np.column_stack([rng.integers(1, 374, 10_000), rng.geometric(0.05, 10_000), rng.lognormal(6.5, 1.2, 10_000)])
+
+    print(f"{'concurrency':>11} {'requests':>9} {'req/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'errors':>7}")
+    for concurrency in args.concurrency:
+        latencies, errors = [], []
+        per_thread = max(args.requests // concurrency, 1)
+        threads = [threading.Thread(target=worker, args=(args.url, per_thread, args.batch_size, rows, latencies, errors))
+                   for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000 if latencies else (float('nan'), float('nan'))
+        print(f"{concurrency:>11} {len(latencies):>9} {len(latencies) / elapsed:>10,.0f} {p50:>9.2f} {p99:>9.2f} {len(errors):>7}")
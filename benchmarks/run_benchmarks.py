@@ -0,0 +1,147 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import sklearn
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from synthetic_data import generate_transactions, write_transactions
+from utils.data_processing import load_data, clean_data, aggregate_customers, rfm_from_aggregates, transform_rfm_data, remove_outliers_iqr
+from utils.rfm_analysis import calculate_rfm_scores, segment_customers
+from utils.clustering import perform_clustering
+from utils.profiling import RunReport
+from prediction import CustomerSegmentationPredictor, FEATURES
+from compiled_model import export_compiled_model, CompiledSegmentationPredictor
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run_scale(n_rows, n_customers, skew, engine, predict_rows, single_rows, work_dir, seed):
+    csv_path = os.path.join(work_dir, f"transactions-{n_rows}.csv")
+    write_transactions(generate_transactions(n_rows, n_customers, skew=skew, seed=seed), csv_path)
+    report = RunReport(rows=n_rows, customers=n_customers)
+
+    with report.stage('load_data') as stage:
+        df = load_data(csv_path)
+        stage['rows_out'] = len(df)
+    with report.stage('clean_data', rows_in=len(df)) as stage:
+        df_clean = clean_data(df)
+        stage['rows_out'] = len(df_clean)
+    with report.stage('aggregate_customers', rows_in=len(df_clean)) as stage:
+        aggregates = aggregate_customers(df_clean)
+        stage['rows_out'] = len(aggregates)
+    del df, df_clean
+    with report.stage('prepare_rfm_data', rows_in=len(aggregates)) as stage:
+        rfm = rfm_from_aggregates(aggregates)
+        raw_rfm = rfm[FEATURES].to_numpy(dtype=np.float64)
+        rfm = transform_rfm_data(rfm)
+        stage['rows_out'] = len(rfm)
+    with report.stage('remove_outliers_iqr', rows_in=len(rfm)) as stage:
+        rfm = remove_outliers_iqr(rfm)
+        stage['rows_out'] = len(rfm)
+    with report.stage('calculate_rfm_scores', rows_in=len(rfm)) as stage:
+        rfm_segments = calculate_rfm_scores(rfm)
+        stage['rows_out'] = len(rfm_segments)
+    with report.stage('segment_customers', rows_in=len(rfm_segments)) as stage:
+        rfm_segments = segment_customers(rfm_segments)
+        stage['rows_out'] = len(rfm_segments)
+    with report.stage('perform_clustering', rows_in=len(rfm)) as stage:
+        _, kmeans_model, scaler, cluster_labels = perform_clustering(rfm_segments, engine=engine)
+        stage['rows_out'] = len(rfm)
+
+    # Score a population of the requested size resampled from the real RFM rows.
+    rng = np.random.default_rng(seed)
+    batch = raw_rfm[rng.integers(0, len(raw_rfm), predict_rows)]
+    single = batch[:single_rows]
+    predictor = CustomerSegmentationPredictor(kmeans_model=kmeans_model, scaler=scaler)
+    predictor.cluster_labels = cluster_labels
+    model_path = os.path.join(work_dir, "segmentation_model.bundle")
+    export_compiled_model(kmeans_model, scaler, cluster_labels, model_path, engine=engine)
+    compiled = CompiledSegmentationPredictor(model_path)
+
+    for name, model in [('predict', predictor), ('compiled_predict', compiled)]:
+        with report.stage(f"{name}_batch", rows_in=len(batch)) as stage:
+            stage['rows_out'] = len(model.predict_segments(batch)[1])
+        with report.stage(f"{name}_single", rows_in=len(single)) as stage:
+            stage['rows_out'] = len([model.predict_segment(*row) for row in single])
+    os.remove(csv_path)
+    print(f"\n{n_rows:,} rows, {n_customers:,} customers")
+    report.print_summary()
+    return report.to_dict()
+
+def latest_result(results_dir):
+    paths = sorted(glob.glob(os.path.join(results_dir, "*.json")))
+    return paths[-1] if paths else None
+
+def compare(current, baseline, threshold, min_seconds):
+    previous = {(scale['params']['rows'], stage['stage']): stage['wall_s']
+                for scale in baseline['scales'] for stage in scale['stages']}
+    print(f"\nCompared with {baseline['commit']} ({baseline['started_at']}):")
+    print(f"{'rows':>12} {'stage':<24} {'before (s)':>11} {'now (s)':>9} {'ratio':>7}")
+    regressions = 0
+    for scale in current['scales']:
+        for stage in scale['stages']:
+            before = previous.get((scale['params']['rows'], stage['stage']))
+            if before is None or max(before, stage['wall_s']) < min_seconds:
+                continue
+            ratio = stage['wall_s'] / before if before > 0 else float('inf')
+            flag = "  SLOWER" if ratio > threshold else ""
+            regressions += bool(flag)
+            print(f"{scale['params']['rows']:>12,} {stage['stage']:<24} {before:>11.3f} {stage['wall_s']:>9.3f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every pipeline stage, clustering and prediction on synthetic data at several scales.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--rows-per-customer", type=int, default=120, help="Customers generated per scale = rows / this")
+    parser.add_argument("--skew", type=float, default=0.7)
+    parser.add_argument("--engine", default="kmeans")
+    parser.add_argument("--predict-rows", type=int, default=1_000_000, help="Customers scored by the batch prediction stages")
+    parser.add_argument("--single-rows", type=int, default=2_000, help="Customers scored one call at a time")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--baseline", help="Result file to compare against (default: the latest one in --results-dir)")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Flag stages slower than baseline by more than this ratio")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="Skip stages faster than this in both runs; they are mostly noise")
+    args = parser.parse_args()
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    baseline_path = args.baseline or latest_result(args.results_dir)
+    result = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'environment': {
+            'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'sklearn': sklearn.__version__, 'machine': platform.machine(), 'cpus': os.cpu_count(),
+        },
+        'params': {'skew': args.skew, 'engine': args.engine, 'predict_rows': args.predict_rows,
+                   'single_rows': args.single_rows, 'seed': args.seed},
+        'scales': [],
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_rows in args.rows:
+            scale = run_scale(n_rows, max(n_rows // args.rows_per_customer, 10), args.skew, args.engine,
+                              args.predict_rows, args.single_rows, work_dir, args.seed)
+            result['scales'].append(scale)
+
+    path = os.path.join(args.results_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{result['commit']}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults saved to {path}")
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(result, json.load(f), args.threshold, args.min_seconds)
+        sys.exit(1 if regressions else 0)
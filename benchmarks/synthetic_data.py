@@ -0,0 +1,137 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# Non-product lines that clean_data drops: letter-prefixed codes and the two
+# service descriptions.
+SERVICE_ITEMS = [
+    ('POST', 'POSTAGE', 18.0),
+    ('M', 'Manual', 2.5),
+    ('DOT', 'DOTCOM POSTAGE', 11.0),
+    ('BANK CHARGES', 'Bank Charges', 15.0),
+    ('23444', 'Next Day Carriage', 15.0),
+    ('23702', 'High Resolution Image', 3.0),
+]
+COLOURS = ['WHITE', 'RED', 'PINK', 'BLUE', 'GREEN', 'IVORY', 'BLACK', 'VINTAGE', 'REGENCY', 'JUMBO']
+ITEMS = ['MUG', 'BAG', 'LANTERN', 'CANDLE HOLDER', 'HEART', 'TEA SET', 'CAKESTAND', 'BUNTING', 'LUNCH BOX', 'DOORMAT']
+COUNTRIES = ['United Kingdom', 'Germany', 'France', 'EIRE', 'Spain', 'Netherlands']
+
+def zipf_weights(n, skew):
+    # Popularity falls off as rank**-skew; skew=0 is uniform.
+    weights = np.arange(1, n + 1, dtype=np.float64) ** -skew
+    return weights / weights.sum()
+
+def make_catalog(n_products, rng):
+    codes = (20000 + np.arange(n_products)).astype(str).astype(object)
+    # Like the real catalog, some variants carry a letter suffix ("85123A").
+    suffixed = rng.random(n_products) < 0.1
+    codes[suffixed] = codes[suffixed] + rng.choice(list('ABCDE'), suffixed.sum()).astype(object)
+    descriptions = np.array([f"{COLOURS[i % len(COLOURS)]} {ITEMS[i // len(COLOURS) % len(ITEMS)]} {i}" for i in range(n_products)], dtype=object)
+    prices = np.round(rng.lognormal(0.8, 0.8, n_products), 2)
+    return codes, descriptions, prices
+
+def generate_transactions(n_rows, n_customers, skew=0.7, n_products=4_000, seed=42,
+                          cancel_rate=0.02, missing_id_rate=0.25, service_rate=0.005,
+                          zero_price_rate=0.002, duplicate_rate=0.005, start="2010-12-01", days=373, first_invoice=536365):
+    # Online Retail shaped lines: invoices of several lines from one customer
+    # at one time, customers and products drawn with Zipf-like skew, and the
+    # noise clean_data removes (cancellations, missing CustomerID, service
+    # lines, zero prices, duplicated rows).
+    rng = np.random.default_rng(seed)
+    n_unique = n_rows - int(n_rows * duplicate_rate)
+
+    lines_per_invoice = rng.geometric(1 / 20, n_unique)
+    n_invoices = int(np.searchsorted(np.cumsum(lines_per_invoice), n_unique)) + 1
+    lines_per_invoice = lines_per_invoice[:n_invoices]
+    lines_per_invoice[-1] -= lines_per_invoice.sum() - n_unique
+
+    minutes = np.sort(rng.integers(0, days * 24 * 60, n_invoices))
+    invoice_dates = (pd.Timestamp(start) + pd.to_timedelta(minutes, unit="min")).strftime('%m/%d/%Y %H:%M').to_numpy(dtype=object)
+    cancelled = rng.random(n_invoices) < cancel_rate
+    invoice_numbers = (first_invoice + np.arange(n_invoices)).astype(str).astype(object)
+    invoice_numbers[cancelled] = 'C' + invoice_numbers[cancelled]
+
+    customers = (12346 + rng.permutation(n_customers)[rng.choice(n_customers, n_invoices, p=zipf_weights(n_customers, skew))]).astype(np.float64)
+    customers[rng.random(n_invoices) < missing_id_rate] = np.nan
+    countries = np.array(COUNTRIES, dtype=object)[rng.choice(len(COUNTRIES), n_invoices, p=[0.9, 0.03, 0.03, 0.02, 0.01, 0.01])]
+
+    codes, descriptions, prices = make_catalog(n_products, rng)
+    products = rng.choice(n_products, n_unique, p=zipf_weights(n_products, skew))
+    stock_codes, line_descriptions, unit_prices = codes[products], descriptions[products], prices[products]
+    service = np.flatnonzero(rng.random(n_unique) < service_rate)
+    picked = rng.integers(0, len(SERVICE_ITEMS), len(service))
+    stock_codes[service] = np.array([item[0] for item in SERVICE_ITEMS], dtype=object)[picked]
+    line_descriptions[service] = np.array([item[1] for item in SERVICE_ITEMS], dtype=object)[picked]
+    unit_prices[service] = np.array([item[2] for item in SERVICE_ITEMS])[picked]
+    unit_prices[rng.random(n_unique) < zero_price_rate] = 0.0
+
+    quantities = rng.geometric(0.15, n_unique)
+    invoice_of_line = np.repeat(np.arange(n_invoices), lines_per_invoice)
+    quantities[cancelled[invoice_of_line]] *= -1
+
+    df = pd.DataFrame({
+        'InvoiceNo': invoice_numbers[invoice_of_line],
+        'StockCode': stock_codes,
+        'Description': line_descriptions,
+        'Quantity': quantities,
+        'InvoiceDate': invoice_dates[invoice_of_line],
+        'UnitPrice': unit_prices,
+        'CustomerID': customers[invoice_of_line],
+        'Country': countries[invoice_of_line],
+    })
+    duplicates = np.sort(rng.choice(n_unique, n_rows - n_unique, replace=False))
+    order = np.argsort(np.concatenate([np.arange(n_unique), duplicates]), kind='stable')
+    return pd.concat([df, df.iloc[duplicates]]).iloc[order].reset_index(drop=True)
+
+def write_transactions(df, path, append=False):
+    df.to_csv(path, index=False, encoding='ISO-8859-1', mode="a" if append else "w", header=not append)
+
+def write_transactions_chunked(path, n_rows, n_customers, chunk_rows=2_000_000, seed=42, **kwargs):
+    # Large files are generated and written a chunk at a time; each chunk
+    # continues the invoice numbering and draws from the same customers.
+    first_invoice, n_written, n_chunks = 536365, 0, 0
+    while n_written < n_rows:
+        df = generate_transactions(min(chunk_rows, n_rows - n_written), n_customers, seed=seed + n_chunks,
+                                   first_invoice=first_invoice, **kwargs)
+        write_transactions(df, path, append=n_chunks > 0)
+        first_invoice = int(df['InvoiceNo'].str.lstrip('C').astype(np.int64).max()) + 1
+        n_written += len(df)
+        n_chunks += 1
+    return n_written
+
+def write_transactions_monthly(directory, n_rows, n_customers, n_files=12, seed=42, start="2010-12-01", **kwargs):
+    # One file per month, like invoices exported monthly; the files continue
+    # the invoice numbering and share the customer base.
+    os.makedirs(directory, exist_ok=True)
+    months = pd.date_range(start, periods=n_files + 1, freq="MS")
+    first_invoice, paths = 536365, []
+    for i in range(n_files):
+        n_month = n_rows // n_files + (i < n_rows % n_files)
+        df = generate_transactions(n_month, n_customers, seed=seed + i, start=months[i].strftime('%Y-%m-%d'),
+                                   days=(months[i + 1] - months[i]).days, first_invoice=first_invoice, **kwargs)
+        path = os.path.join(directory, f"invoices-{months[i]:%Y-%m}.csv")
+        write_transactions(df, path)
+        first_invoice = int(df['InvoiceNo'].str.lstrip('C').astype(np.int64).max()) + 1
+        paths.append(path)
+    return paths
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic transactions CSV in the E-commerce (Online Retail) schema.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--customers", type=int, default=20_000)
+    parser.add_argument("--products", type=int, default=4_000)
+    parser.add_argument("--skew", type=float, default=0.7, help="Zipf exponent of customer and product popularity")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=2_000_000, help="Rows generated and written at a time")
+    parser.add_argument("--out", default="data/synthetic.csv")
+    parser.add_argument("--monthly-files", type=int, help="Write this many monthly files into the --out directory instead of one CSV")
+    args = parser.parse_args()
+    if args.monthly_files:
+        paths = write_transactions_monthly(args.out, args.rows, args.customers, args.monthly_files,
+                                           seed=args.seed, skew=args.skew, n_products=args.products)
+        print(f"Wrote {args.rows:,} rows in {len(paths)} files to {args.out}")
+        raise SystemExit
+    n_rows = write_transactions_chunked(args.out, args.rows, args.customers, chunk_rows=args.chunk_rows,
+                                       seed=args.seed, skew=args.skew, n_products=args.products)
+    print(f"Wrote {n_rows:,} rows for up to {args.customers:,} customers to {args.out}")
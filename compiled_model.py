@@ -0,0 +1,115 @@
+import math
+import numpy as np
+from model_bundle import read_model_bundle, save_model_bundle
+
+FEATURES = ['Recency', 'Frequency', 'Monetary']
+MODEL_PATH = "outputs/models/segmentation_model.bundle"
+
+def export_compiled_model(kmeans_model, scaler, cluster_labels, path=MODEL_PATH, engine='kmeans', reference=None):
+    # Only plain float arrays and JSON metadata go into the bundle, so loading
+    # it needs neither sklearn nor unpickling. `reference` holds extra arrays
+    # such as the drift reference profile from drift.reference_profile.
+    save_model_bundle(kmeans_model, scaler, cluster_labels, path, engine=engine, extra_arrays=reference)
+
+def nearest_centroids(features, centroids, centroid_norms=None):
+    # One pass over the (k, n) distance matrix keeping the nearest and
+    # second-nearest centroid per row. Returns the cluster, the Euclidean
+    # distance to it in scaled space, and the margin to the runner-up.
+    if centroid_norms is None:
+        centroid_norms = (centroids ** 2).sum(axis=1)
+    distances = (-2 * centroids) @ features.T
+    distances += centroid_norms[:, None]
+    best = distances[0].copy()
+    second = np.full_like(best, np.inf)
+    clusters = np.zeros(distances.shape[1], dtype=np.intp)
+    for cluster in range(1, len(distances)):
+        row = distances[cluster]
+        closer = row < best
+        second = np.where(closer, best, np.minimum(second, row))
+        np.minimum(best, row, out=best)
+        clusters[closer] = cluster
+    squared_norms = np.einsum('ij,ij->i', features, features)
+    best = np.sqrt(np.maximum(best + squared_norms, 0))
+    second = np.sqrt(np.maximum(second + squared_norms, 0))
+    return clusters, best, second - best
+
+def load_log_centroids(path=MODEL_PATH):
+    # Centroids mapped back to log(RFM) space, independent of the scaler they
+    # were fitted under; used to warm-start the next retrain.
+    arrays, _ = read_model_bundle(path)
+    return arrays['centroids'] * arrays['scale'] + arrays['mean']
+
+class CompiledSegmentationPredictor:
+    def __init__(self, path=MODEL_PATH, verify=True):
+        arrays, metadata = read_model_bundle(path, verify=verify)
+        self.mean = arrays['mean']
+        self.scale = arrays['scale']
+        self.centroids = arrays['centroids']
+        self.labels = np.array(metadata['labels'], dtype=str)
+        self.engine = metadata.get('engine', 'kmeans')
+        # Bundles written before drift monitoring have no reference profile.
+        self.reference = {name: array for name, array in arrays.items() if name.startswith('drift_')} or None
+        # Python-float copies for the single-customer path, where NumPy's
+        # per-call overhead would dominate three logs and a handful of FMAs.
+        self._mean = tuple(self.mean.tolist())
+        self._scale = tuple(self.scale.tolist())
+        self._centroids = tuple(tuple(c) for c in self.centroids.tolist())
+        self._labels = tuple(self.labels.tolist())
+        self._label_lookup = self.labels.astype(object)
+        # argmin ||x - c||^2 == argmin ||c||^2 - 2 x.c, the same expansion
+        # KMeans.predict uses, so boundary cases resolve the same way.
+        self._centroid_norms = (self.centroids ** 2).sum(axis=1)
+        self._centroid_terms = tuple(
+            (norm, -2 * c0, -2 * c1, -2 * c2)
+            for norm, (c0, c1, c2) in zip(self._centroid_norms.tolist(), self._centroids)
+        )
+
+    def predict_cluster(self, recency, frequency, monetary):
+        (m0, m1, m2), (s0, s1, s2) = self._mean, self._scale
+        x0 = (math.log1p(recency) - m0) / s0
+        x1 = (math.log1p(frequency) - m1) / s1
+        x2 = (math.log1p(monetary) - m2) / s2
+        best, best_distance = 0, math.inf
+        for cluster, (norm, c0, c1, c2) in enumerate(self._centroid_terms):
+            distance = norm + x0 * c0 + x1 * c1 + x2 * c2
+            if distance < best_distance:
+                best, best_distance = cluster, distance
+        return best
+
+    def predict_segment(self, recency, frequency, monetary):
+        return self._labels[self.predict_cluster(recency, frequency, monetary)]
+
+    def transform(self, rfm):
+        if hasattr(rfm, 'columns'):
+            rfm = rfm[FEATURES].to_numpy(dtype=np.float64)
+        features = np.log1p(np.asarray(rfm, dtype=np.float64).reshape(-1, 3))
+        features -= self.mean
+        features /= self.scale
+        return features
+
+    def predict_clusters(self, rfm):
+        features = self.transform(rfm)
+        # (k, n) layout keeps each centroid's distances contiguous; a running
+        # minimum over k rows beats argmin across a short inner axis.
+        distances = (-2 * self.centroids) @ features.T
+        distances += self._centroid_norms[:, None]
+        best = distances[0].copy()
+        clusters = np.zeros(distances.shape[1], dtype=np.intp)
+        for cluster in range(1, len(distances)):
+            closer = distances[cluster] < best
+            np.minimum(best, distances[cluster], out=best)
+            clusters[closer] = cluster
+        return clusters
+
+    def predict_segments(self, rfm):
+        clusters = self.predict_clusters(rfm)
+        return clusters, self._label_lookup[clusters]
+
+    def score(self, rfm):
+        # Like predict_clusters, plus how confident each assignment is: the
+        # distance to the chosen centroid and the margin to the next nearest.
+        return nearest_centroids(self.transform(rfm), self.centroids, self._centroid_norms)
+
+    def score_segments(self, rfm):
+        clusters, distances, margins = self.score(rfm)
+        return clusters, self._label_lookup[clusters], distances, margins
@@ -5,7 +5,13 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
+import json
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.summary import build_dashboard_summary
+from utils.output_store import OutputStore
 
 # Initialize the app with external CSS
 app = dash.Dash(__name__)
@@ -78,23 +84,69 @@ app.index_string = '''
 </html>
 '''
 
-def load_data():
+OUTPUTS_DIR = "../outputs"
+SUMMARY_PATH = os.path.join(OUTPUTS_DIR, "dashboard_summary.json")
+RFM_SEGMENTS_PATH = os.path.join(OUTPUTS_DIR, "rfm_segments.csv")
+CLUSTERED_PATH = os.path.join(OUTPUTS_DIR, "clustered_segments.csv")
+STORE_PATH = os.path.join(OUTPUTS_DIR, "segments.sqlite")
+
+# In-process memo keyed on the files' modification times, so a rerun of
+# main.py invalidates it without restarting the dashboard.
+_memo = {}
+
+def memoized(key, paths, compute, release=None):
+    # `release` is called on a value when a newer one replaces it.
     try:
-        if os.path.exists("../outputs/rfm_segments.csv"):
-            rfm_segments = pd.read_csv("../outputs/rfm_segments.csv")
-        else:
-            rfm_segments = None
-        
-        if os.path.exists("../outputs/clustered_segments.csv"):
-            clustered_data = pd.read_csv("../outputs/clustered_segments.csv")
-        else:
-            clustered_data = None
-            
-        return rfm_segments, clustered_data
-    except:
-        return None, None
+        stamp = tuple(os.stat(path).st_mtime_ns for path in paths)
+    except FileNotFoundError:
+        return None
+    cached = _memo.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    value = compute()
+    _memo[key] = (stamp, value)
+    if cached is not None and release is not None:
+        release(cached[1])
+    return value
+
+def _read_summary():
+    with open(SUMMARY_PATH) as f:
+        return json.load(f)
 
-rfm_segments, clustered_data = load_data()
+def load_summary():
+    summary = memoized("summary", [SUMMARY_PATH], _read_summary)
+    if summary is None:
+        # Outputs written before the summary artifact existed.
+        summary = memoized("summary-from-csv", [RFM_SEGMENTS_PATH, CLUSTERED_PATH],
+                           lambda: build_dashboard_summary(pd.read_csv(RFM_SEGMENTS_PATH), pd.read_csv(CLUSTERED_PATH)))
+    return summary
+
+# Level of detail for the 3D scatter: never ship more than this many points to
+# the browser, whatever the customer count.
+SCATTER_POINT_BUDGET = int(os.environ.get("SCATTER_POINT_BUDGET", 5000))
+SCATTER_BUDGET_STEPS = [1000, 5000, 20000, 50000, 100000]
+
+def load_store():
+    return memoized("store", [STORE_PATH], lambda: OutputStore(STORE_PATH), release=OutputStore.close)
+
+def load_clustered_data():
+    dtypes = {'Recency': 'float32', 'Frequency': 'float32', 'Monetary': 'float32', 'Cluster_Labels': 'category'}
+    return memoized("clustered", [CLUSTERED_PATH],
+                    lambda: pd.read_csv(CLUSTERED_PATH, usecols=list(dtypes), dtype=dtypes))
+
+def stratified_sample(df, budget, by='Cluster_Labels', seed=42):
+    # Per-group quotas proportional to group size, with a floor so small
+    # clusters stay visible next to large ones.
+    if len(df) <= budget:
+        return df
+    rng = np.random.default_rng(seed)
+    groups = df.groupby(by, observed=True).indices
+    floor = budget // (10 * max(len(groups), 1))
+    picked = []
+    for rows in groups.values():
+        quota = min(len(rows), max(floor, int(budget * len(rows) / len(df))))
+        picked.append(rng.choice(rows, size=quota, replace=False))
+    return df.iloc[np.sort(np.concatenate(picked))]
 
 # Define color schemes
 colors = {
@@ -106,102 +158,130 @@ colors = {
     'danger': '#ef5777'
 }
 
-app.layout = html.Div([
-    html.Div([
-        # Header
+def stat_card(value, label):
+    return html.Div([
+        html.H3(f"{value if value is not None else 'N/A'}", 
+               style={'margin': '0', 'font-size': '2rem'}),
+        html.P(label, style={'margin': '5px 0 0 0'})
+    ], className='stat-card')
+
+def range_slider(component_id, label, bounds):
+    low, high = bounds
+    return html.Div([
+        html.Label(label, style={'font-size': '0.85rem'}),
+        dcc.RangeSlider(id=component_id, min=low, max=high, value=[low, high],
+                        step=(high - low) / 100 or None, marks=None,
+                        tooltip={'placement': 'bottom'})
+    ])
+
+def scatter_controls(summary):
+    ranges = (summary or {}).get('feature_ranges') or {col: [0, 1] for col in ['Recency', 'Frequency', 'Monetary']}
+    return html.Div([
         html.Div([
-            html.H1([
-                html.I(className="fas fa-chart-pie", style={'margin-right': '15px'}),
-                "Customer Segmentation Analytics"
-            ], style={'margin': '0', 'font-size': '2.5rem', 'font-weight': '300'}),
-            html.P("RFM Analysis & K-Means Clustering Dashboard", 
-                  style={'margin': '10px 0 0 0', 'font-size': '1.2rem', 'opacity': '0.9'})
-        ], className='header'),
-        
-        # Stats Cards
+            html.Label("Points shown", style={'font-size': '0.85rem'}),
+            dcc.Slider(id="scatter-budget", min=0, max=len(SCATTER_BUDGET_STEPS) - 1, step=1,
+                       value=SCATTER_BUDGET_STEPS.index(SCATTER_POINT_BUDGET) if SCATTER_POINT_BUDGET in SCATTER_BUDGET_STEPS else 1,
+                       marks={i: f"{n:,}" for i, n in enumerate(SCATTER_BUDGET_STEPS)}),
+        ]),
+        dcc.Checklist(id="scatter-options", options=[{'label': ' Show cluster centroids', 'value': 'centroids'}],
+                      value=['centroids'], style={'font-size': '0.85rem'}),
+        # Narrowing a range re-samples inside that box, so zooming in on a
+        # region fetches more of its points instead of thinning the whole cloud.
+        range_slider("scatter-recency", "Recency (Log) range", ranges['Recency']),
+        range_slider("scatter-frequency", "Frequency (Log) range", ranges['Frequency']),
+        range_slider("scatter-monetary", "Monetary (Log) range", ranges['Monetary']),
+    ])
+
+def serve_layout():
+    summary = load_summary()
+    return html.Div([
         html.Div([
+            # Header
             html.Div([
-                html.H3(f"{len(rfm_segments) if rfm_segments is not None else 'N/A'}", 
-                       style={'margin': '0', 'font-size': '2rem'}),
-                html.P("Total Customers", style={'margin': '5px 0 0 0'})
-            ], className='stat-card'),
+                html.H1([
+                    html.I(className="fas fa-chart-pie", style={'margin-right': '15px'}),
+                    "Customer Segmentation Analytics"
+                ], style={'margin': '0', 'font-size': '2.5rem', 'font-weight': '300'}),
+                html.P("RFM Analysis & K-Means Clustering Dashboard", 
+                      style={'margin': '10px 0 0 0', 'font-size': '1.2rem', 'opacity': '0.9'})
+            ], className='header'),
             
+            # Stats Cards
             html.Div([
-                html.H3(f"{rfm_segments['segment'].nunique() if rfm_segments is not None else 'N/A'}", 
-                       style={'margin': '0', 'font-size': '2rem'}),
-                html.P("RFM Segments", style={'margin': '5px 0 0 0'})
-            ], className='stat-card'),
+                stat_card(summary['total_customers'] if summary else None, "Total Customers"),
+                stat_card(len(summary['segment_counts']) if summary else None, "RFM Segments"),
+                stat_card(summary['n_clusters'] if summary else None, "Clusters"),
+                stat_card(summary['segment_counts'].get('champions', 0) if summary else None, "Champions"),
+            ], className='stats-container'),
             
+            # Charts Row 1
             html.Div([
-                html.H3(f"{clustered_data['Cluster'].nunique() if clustered_data is not None else 'N/A'}", 
-                       style={'margin': '0', 'font-size': '2rem'}),
-                html.P("Clusters", style={'margin': '5px 0 0 0'})
-            ], className='stat-card'),
+                html.Div([
+                    html.Div([
+                        dcc.Graph(id="rfm-sunburst")
+                    ], className='chart-container')
+                ], style={'width': '50%', 'display': 'inline-block'}),
             
-            html.Div([
-                html.H3(f"{len(rfm_segments[rfm_segments['segment'] == 'champions']) if rfm_segments is not None else 'N/A'}", 
-                       style={'margin': '0', 'font-size': '2rem'}),
-                html.P("Champions", style={'margin': '5px 0 0 0'})
-            ], className='stat-card'),
-        ], className='stats-container'),
-        
-        # Charts Row 1
-        html.Div([
-            html.Div([
                 html.Div([
-                    dcc.Graph(id="rfm-sunburst")
-                ], className='chart-container')
-            ], style={'width': '50%', 'display': 'inline-block'}),
+                    html.Div([
+                        dcc.Graph(id="cluster-3d"),
+                        scatter_controls(summary)
+                    ], className='chart-container')
+                ], style={'width': '50%', 'display': 'inline-block'}),
+            ]),
             
+            # Charts Row 2
             html.Div([
                 html.Div([
-                    dcc.Graph(id="cluster-3d")
-                ], className='chart-container')
-            ], style={'width': '50%', 'display': 'inline-block'}),
-        ]),
-        
-        # Charts Row 2
-        html.Div([
-            html.Div([
+                    html.Div([
+                        dcc.Graph(id="rfm-heatmap")
+                    ], className='chart-container')
+                ], style={'width': '50%', 'display': 'inline-block'}),
+            
                 html.Div([
-                    dcc.Graph(id="rfm-heatmap")
-                ], className='chart-container')
-            ], style={'width': '50%', 'display': 'inline-block'}),
+                    html.Div([
+                        dcc.Graph(id="cluster-comparison")
+                    ], className='chart-container')
+                ], style={'width': '50%', 'display': 'inline-block'}),
+            ]),
             
+            # Customer Lookup
+            html.Div([
+                html.H3("🔎 Customer Lookup", style={'color': colors['primary'], 'margin-bottom': '20px'}),
+                dcc.Input(id="customer-id", type="number", placeholder="CustomerID", debounce=True),
+                html.Div(id="customer-lookup", style={'margin-top': '15px'})
+            ], className='chart-container'),
+            
+            # Data Table
             html.Div([
                 html.Div([
-                    dcc.Graph(id="cluster-comparison")
+                    html.H3("📊 Customer Segments Summary", 
+                           style={'color': colors['primary'], 'margin-bottom': '20px'}),
+                    html.Div(id="segments-table")
                 ], className='chart-container')
-            ], style={'width': '50%', 'display': 'inline-block'}),
-        ]),
-        
-        # Data Table
-        html.Div([
-            html.Div([
-                html.H3("📊 Customer Segments Summary", 
-                       style={'color': colors['primary'], 'margin-bottom': '20px'}),
-                html.Div(id="segments-table")
-            ], className='chart-container')
-        ])
-        
-    ], className='main-container')
-])
+            ])
+            
+        ], className='main-container')
+    ])
+
+app.layout = serve_layout
 
 @app.callback(
     Output("rfm-sunburst", "figure"),
     Input("rfm-sunburst", "id")
 )
 def update_sunburst(_):
-    if rfm_segments is None:
+    summary = load_summary()
+    if summary is None:
         return {"data": [], "layout": {"title": "No RFM data found. Run main.py first."}}
     
     # Create hierarchical data for sunburst
-    segment_counts = rfm_segments['segment'].value_counts()
+    segment_counts = summary['segment_counts']
     
     fig = go.Figure(go.Sunburst(
-        labels=list(segment_counts.index) + ['All Customers'],
-        parents=['All Customers'] * len(segment_counts.index) + [''],
-        values=list(segment_counts.values) + [segment_counts.sum()],
+        labels=list(segment_counts) + ['All Customers'],
+        parents=['All Customers'] * len(segment_counts) + [''],
+        values=list(segment_counts.values()) + [sum(segment_counts.values())],
         branchvalues="total",
         hovertemplate='<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percentParent}<extra></extra>',
         maxdepth=2,
@@ -220,22 +300,53 @@ def update_sunburst(_):
 
 @app.callback(
     Output("cluster-3d", "figure"),
-    Input("cluster-3d", "id")
+    Input("scatter-budget", "value"),
+    Input("scatter-options", "value"),
+    Input("scatter-recency", "value"),
+    Input("scatter-frequency", "value"),
+    Input("scatter-monetary", "value")
 )
-def update_3d_scatter(_):
+def update_3d_scatter(budget_step, options, recency_range, frequency_range, monetary_range):
+    clustered_data = load_clustered_data()
     if clustered_data is None:
         return {"data": [], "layout": {"title": "No cluster data found. Run main.py first."}}
     
+    budget = SCATTER_BUDGET_STEPS[budget_step] if budget_step is not None else SCATTER_POINT_BUDGET
+    in_view = np.ones(len(clustered_data), dtype=bool)
+    for col, bounds in (('Recency', recency_range), ('Frequency', frequency_range), ('Monetary', monetary_range)):
+        if bounds:
+            values = clustered_data[col].to_numpy()
+            in_view &= (values >= bounds[0]) & (values <= bounds[1])
+    visible = clustered_data[in_view]
+    sample = stratified_sample(visible, budget)
+    
     fig = px.scatter_3d(
-        clustered_data,
+        sample,
         x='Recency',
         y='Frequency',
         z='Monetary',
         color='Cluster_Labels',
-        title="🎯 3D Cluster Visualization",
+        title=f"🎯 3D Cluster Visualization ({len(sample):,} of {len(visible):,} customers)",
         labels={'Cluster_Labels': 'Cluster'},
         color_discrete_sequence=px.colors.qualitative.Set2
     )
+    fig.update_traces(marker=dict(size=3, opacity=0.7))
+    
+    summary = load_summary()
+    if summary and 'cluster_centroids' in summary and 'centroids' in (options or []):
+        centroids = summary['cluster_centroids']
+        counts = summary['cluster_counts']
+        fig.add_trace(go.Scatter3d(
+            x=[c[0] for c in centroids.values()],
+            y=[c[1] for c in centroids.values()],
+            z=[c[2] for c in centroids.values()],
+            mode='markers+text',
+            text=list(centroids),
+            customdata=[counts.get(label, 0) for label in centroids],
+            marker=dict(size=10, color='black', symbol='diamond'),
+            name='Centroids',
+            hovertemplate='<b>%{text}</b><br>Customers: %{customdata:,}<extra></extra>'
+        ))
     
     fig.update_layout(
         scene=dict(
@@ -247,7 +358,8 @@ def update_3d_scatter(_):
         font_family="Roboto",
         title_font_size=18,
         title_font_color=colors['primary'],
-        height=500
+        height=500,
+        uirevision='cluster-3d'
     )
     
     return fig
@@ -257,17 +369,17 @@ def update_3d_scatter(_):
     Input("rfm-heatmap", "id")
 )
 def update_heatmap(_):
-    if rfm_segments is None:
+    summary = load_summary()
+    if summary is None:
         return {"data": [], "layout": {"title": "No RFM data found. Run main.py first."}}
     
-    # Create RFM score heatmap
-    heatmap_data = rfm_segments.groupby(['recency_score', 'frequency_score']).size().reset_index(name='count')
-    heatmap_pivot = heatmap_data.pivot(index='recency_score', columns='frequency_score', values='count').fillna(0)
+    # RFM score heatmap from the precomputed R x F count matrix
+    rf_matrix = summary['rf_matrix']
     
     fig = go.Figure(data=go.Heatmap(
-        z=heatmap_pivot.values,
-        x=[f'F{i}' for i in heatmap_pivot.columns],
-        y=[f'R{i}' for i in heatmap_pivot.index],
+        z=rf_matrix['counts'],
+        x=[f'F{i}' for i in rf_matrix['frequency_scores']],
+        y=[f'R{i}' for i in rf_matrix['recency_scores']],
         colorscale='Viridis',
         hoverongaps=False,
         hovertemplate='Recency: %{y}<br>Frequency: %{x}<br>Count: %{z}<extra></extra>'
@@ -290,7 +402,8 @@ def update_heatmap(_):
     Input("cluster-comparison", "id")
 )
 def update_comparison(_):
-    if rfm_segments is None or clustered_data is None:
+    summary = load_summary()
+    if summary is None:
         return {"data": [], "layout": {"title": "No data found. Run main.py first."}}
     
     # Create subplot for comparison
@@ -301,16 +414,16 @@ def update_comparison(_):
     )
     
     # RFM pie
-    rfm_counts = rfm_segments['segment'].value_counts()
+    rfm_counts = summary['segment_counts']
     fig.add_trace(
-        go.Pie(labels=rfm_counts.index, values=rfm_counts.values, name="RFM"),
+        go.Pie(labels=list(rfm_counts), values=list(rfm_counts.values()), name="RFM"),
         row=1, col=1
     )
     
     # Cluster pie
-    cluster_counts = clustered_data['Cluster_Labels'].value_counts()
+    cluster_counts = summary['cluster_counts']
     fig.add_trace(
-        go.Pie(labels=cluster_counts.index, values=cluster_counts.values, name="Clusters"),
+        go.Pie(labels=list(cluster_counts), values=list(cluster_counts.values()), name="Clusters"),
         row=1, col=2
     )
     
@@ -330,25 +443,18 @@ def update_comparison(_):
     Input("segments-table", "id")
 )
 def update_table(_):
-    if rfm_segments is None:
+    summary = load_summary()
+    if summary is None:
         return html.P("No data available. Please run main.py first.", 
                      style={'text-align': 'center', 'color': colors['danger']})
     
-    # Create summary table
-    summary = rfm_segments.groupby('segment').agg({
-        'CustomerID': 'count',
-        'Recency': 'mean',
-        'Frequency': 'mean',
-        'Monetary': 'mean'
-    }).round(2)
-    
-    summary.columns = ['Count', 'Avg_Recency', 'Avg_Frequency', 'Avg_Monetary']
-    summary['Percentage'] = (summary['Count'] / summary['Count'].sum() * 100).round(1)
-    summary = summary.reset_index()
+    # Per-segment summary table, precomputed by the pipeline
+    segment_summary = summary['segment_summary']
+    columns = ['segment', 'Count', 'Avg_Recency', 'Avg_Frequency', 'Avg_Monetary', 'Percentage']
     
     return dash_table.DataTable(
-        data=summary.to_dict('records'),
-        columns=[{"name": i.replace('_', ' '), "id": i} for i in summary.columns],
+        data=segment_summary,
+        columns=[{"name": i.replace('_', ' '), "id": i} for i in columns],
         style_cell={
             'textAlign': 'center',
             'fontFamily': 'Roboto',
@@ -381,6 +487,26 @@ def update_table(_):
         style_table={'margin': '20px 0'}
     )
 
+@app.callback(
+    Output("customer-lookup", "children"),
+    Input("customer-id", "value")
+)
+def update_customer_lookup(customer_id):
+    if customer_id is None:
+        return None
+    store = load_store()
+    if store is None:
+        return html.P("No customer store available. Please run main.py first.", style={'color': colors['danger']})
+    customer = store.customer(customer_id)
+    if customer is None:
+        return html.P(f"Customer {customer_id} not found.", style={'color': colors['danger']})
+    fields = ['segment', 'Cluster_Labels', 'recency_score', 'frequency_score', 'monetary_score', 'Recency', 'Frequency', 'Monetary']
+    return html.Table([
+        html.Tr([html.Th(field.replace('_', ' '), style={'text-align': 'left', 'padding-right': '20px'}),
+                 html.Td(round(customer[field], 2) if isinstance(customer[field], float) else customer[field])])
+        for field in fields
+    ])
+
 if __name__ == "__main__":
     print("🌐 Open http://127.0.0.1:8050 in your browser")
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,165 @@
+import threading
+from collections import deque
+import numpy as np
+from compiled_model import FEATURES, nearest_centroids
+
+# Live inputs are compared with the training population on three signals:
+# the cluster assignment mix, each log(RFM) feature's decile histogram
+# (population stability index, PSI) and the mean distance to the assigned
+# centroid. A PSI above 0.2 is the conventional "significant shift".
+DRIFT_BINS = 10
+PSI_THRESHOLD = 0.2
+DISTANCE_RATIO_THRESHOLD = 1.25
+MIN_OBSERVATIONS = 1000
+PSI_FLOOR = 1e-4
+
+def _bin(values, edges):
+    # Decile bin per value; values outside the training range fall in the
+    # first or last bin.
+    return np.searchsorted(edges[1:-1], values, side='right')
+
+def reference_profile(log_features, mean, scale, centroids, bins=DRIFT_BINS):
+    # Arrays stored in the model bundle next to the centroids; `log_features`
+    # are the log1p(RFM) rows the model was fitted on.
+    log_features = np.asarray(log_features, dtype=np.float64)
+    centroids = np.asarray(centroids, dtype=np.float64)
+    clusters, distances, _ = nearest_centroids((log_features - mean) / scale, centroids)
+    edges = np.quantile(log_features, np.linspace(0, 1, bins + 1), axis=0).T
+    # Discrete features (day counts, invoice counts) put edges exactly on data
+    # values; nudge them up so float round-off cannot move a value across.
+    edges = edges + 1e-9 * np.maximum(np.abs(edges), 1)
+    feature_mix = np.stack([
+        np.bincount(_bin(log_features[:, i], edges[i]), minlength=bins) for i in range(len(FEATURES))
+    ]) / len(log_features)
+    return {
+        'drift_cluster_mix': np.bincount(clusters, minlength=len(centroids)) / len(clusters),
+        'drift_feature_edges': edges,
+        'drift_feature_mix': feature_mix,
+        'drift_distance': np.array([distances.mean(), distances.std()]),
+    }
+
+class DriftAccumulator:
+    # Running counts in one flat float64 vector:
+    #   [n, cluster counts (k), distance sum, feature sums (3), histograms (3 x bins)]
+    # Each thread adds into its own shard, so update() never takes a lock and
+    # never contends; snapshot() sums the shards. Memory is one shard per live
+    # thread: shards of threads that have exited are folded into `_retired`.
+    def __init__(self, n_clusters, feature_edges):
+        self.n_clusters = n_clusters
+        self.feature_edges = np.asarray(feature_edges, dtype=np.float64)
+        self.bins = self.feature_edges.shape[1] - 1
+        self.size = 1 + n_clusters + 1 + len(FEATURES) + len(FEATURES) * self.bins
+        self._local = threading.local()
+        self._shards = []
+        self._retired = np.zeros(self.size)
+        self._snapshot_lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = np.zeros(self.size)
+            self._local.shard = shard
+            self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def update(self, log_features, clusters, distances):
+        k, bins = self.n_clusters, self.bins
+        delta = np.empty(self.size)
+        delta[0] = len(clusters)
+        delta[1:1 + k] = np.bincount(clusters, minlength=k)
+        delta[1 + k] = distances.sum()
+        delta[2 + k:5 + k] = log_features.sum(axis=0)
+        for i in range(len(FEATURES)):
+            start = 5 + k + i * bins
+            delta[start:start + bins] = np.bincount(_bin(log_features[:, i], self.feature_edges[i]), minlength=bins)
+        self._shard()[:] += delta
+
+    def snapshot(self):
+        # Writers never wait on this lock; it only keeps two snapshots from
+        # retiring the same shard twice.
+        with self._snapshot_lock:
+            total = self._retired.copy()
+            for entry in list(self._shards):
+                thread, shard = entry
+                if thread.is_alive():
+                    total += shard
+                else:
+                    self._retired += shard
+                    total += shard
+                    self._shards.remove(entry)
+            return total
+
+    def unpack(self, counts):
+        k, bins = self.n_clusters, self.bins
+        n = counts[0]
+        return {
+            'n': int(n),
+            'cluster_counts': counts[1:1 + k],
+            'mean_distance': counts[1 + k] / max(n, 1),
+            'feature_means': counts[2 + k:5 + k] / max(n, 1),
+            'feature_counts': counts[5 + k:].reshape(len(FEATURES), bins),
+        }
+
+def psi(observed_counts, reference_mix):
+    observed = np.maximum(observed_counts / max(observed_counts.sum(), 1), PSI_FLOOR)
+    expected = np.maximum(reference_mix, PSI_FLOOR)
+    return float(((observed - expected) * np.log(observed / expected)).sum())
+
+def drift_report(reference, stats):
+    reference_distance = float(reference['drift_distance'][0])
+    if not stats['n']:
+        return {'n': 0, 'reference_cluster_mix': reference['drift_cluster_mix'].round(4).tolist(),
+                'reference_mean_distance': round(reference_distance, 4), 'drifted': False, 'reasons': []}
+    cluster_psi = psi(stats['cluster_counts'], reference['drift_cluster_mix'])
+    feature_psi = {feature: psi(stats['feature_counts'][i], reference['drift_feature_mix'][i]) for i, feature in enumerate(FEATURES)}
+    distance_ratio = stats['mean_distance'] / reference_distance
+    reasons = []
+    if stats['n'] >= MIN_OBSERVATIONS:
+        if cluster_psi > PSI_THRESHOLD:
+            reasons.append(f"cluster mix PSI {cluster_psi:.3f} > {PSI_THRESHOLD}")
+        reasons += [f"{feature} PSI {value:.3f} > {PSI_THRESHOLD}" for feature, value in feature_psi.items() if value > PSI_THRESHOLD]
+        if distance_ratio > DISTANCE_RATIO_THRESHOLD:
+            reasons.append(f"mean centroid distance {distance_ratio:.2f}x the training mean")
+    return {
+        'n': stats['n'],
+        'cluster_mix': (stats['cluster_counts'] / max(stats['n'], 1)).round(4).tolist(),
+        'reference_cluster_mix': reference['drift_cluster_mix'].round(4).tolist(),
+        'cluster_psi': round(cluster_psi, 4),
+        'feature_psi': {feature: round(value, 4) for feature, value in feature_psi.items()},
+        'feature_means': dict(zip(FEATURES, np.round(stats['feature_means'], 4).tolist())),
+        'mean_distance': round(float(stats['mean_distance']), 4),
+        'reference_mean_distance': round(reference_distance, 4),
+        'drifted': bool(reasons),
+        'reasons': reasons,
+    }
+
+class DriftMonitor:
+    # Rolling drift over the last `window` ticks: the accumulator's counts
+    # only grow, so a window is the latest snapshot minus one taken `window`
+    # ticks ago, and the history holds at most `window` snapshots.
+    def __init__(self, reference, window=30):
+        self.reference = reference
+        self.accumulator = DriftAccumulator(len(reference['drift_cluster_mix']), reference['drift_feature_edges'])
+        self.history = deque(maxlen=window)
+
+    @classmethod
+    def for_predictor(cls, predictor, window=30):
+        return cls(predictor.reference, window) if predictor.reference is not None else None
+
+    def observe(self, rfm, clusters, distances):
+        with np.errstate(invalid='ignore'):
+            log_features = np.log1p(np.asarray(rfm, dtype=np.float64).reshape(-1, len(FEATURES)))
+        # The counts only ever grow, so one NaN row would make every later
+        # report NaN; such rows are left out.
+        finite = np.isfinite(log_features).all(axis=1) & np.isfinite(distances)
+        if not finite.all():
+            log_features, clusters, distances = log_features[finite], clusters[finite], distances[finite]
+        self.accumulator.update(log_features, clusters, distances)
+
+    def tick(self):
+        self.history.append(self.accumulator.snapshot())
+
+    def report(self):
+        current = self.accumulator.snapshot()
+        counts = current - self.history[0] if self.history else current
+        return drift_report(self.reference, self.accumulator.unpack(counts))
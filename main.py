@@ -1,37 +1,230 @@
+import argparse
 import os
 import pickle
-from utils.data_processing import load_data, clean_data, prepare_rfm_data, transform_rfm_data, remove_outliers_iqr
-from utils.rfm_analysis import calculate_rfm_scores, segment_customers
-from utils.clustering import perform_clustering
+from utils.data_processing import DEDUP_SCOPES, load_data, clean_data, aggregate_customers, aggregate_customers_streaming, rfm_from_aggregates, transform_rfm_data, iqr_bounds, sketch_iqr_bounds, remove_outliers_iqr
+from utils.rfm_analysis import calculate_rfm_scores, rfm_score_edges, sketch_rfm_score_edges, score_customers, segment_customers
+from utils.clustering import ENGINES, iter_chunks, scale_rfm, sweep_k, choose_k, perform_clustering
+from utils.incremental import save_state, incremental_update
+from utils.ingestion import load_clean_transactions
+from utils.parallel import aggregate_customers_parallel
+from utils.multi_file import resolve_sources, aggregate_customers_files
+from utils.summary import build_dashboard_summary, save_dashboard_summary
+from utils.output_store import write_output_store
+from utils.profiling import RunReport
+from utils.stage_cache import StageCache, array_digest
+from utils import data_processing, ingestion, parallel, multi_file, rfm_analysis, quantile_sketch, clustering, labels
+from compiled_model import export_compiled_model, load_log_centroids
+from drift import reference_profile
 
-def main():
+def main(data_path="data/data.csv", streaming=False, chunksize=1_000_000, dedup='rows', typed=False, jobs=None,
+         n_clusters=4, k_sweep=False, sweep_jobs=None, silhouette_sample_size=10_000, early_stop=False,
+         engine='kmeans', batch_size=10_000, epochs=1, warm_start=False, quantiles='exact', quantile_error=0.01,
+         report_path="outputs/run_report.json", profile_stages=(), trace_memory=False,
+         cache_dir="outputs/cache/stages", cache_size_mb=2048):
     os.makedirs("outputs", exist_ok=True)
     os.makedirs("outputs/models", exist_ok=True)
+    report = RunReport(profile_stages, trace_memory=trace_memory, data_path=data_path, streaming=streaming, dedup=dedup, typed=typed, jobs=jobs,
+                       n_clusters=n_clusters, engine=engine, quantiles=quantiles)
     
-    df = load_data("data/data.csv")
-    df_clean = clean_data(df)
-    rfm = prepare_rfm_data(df_clean)
-    rfm = transform_rfm_data(rfm)
-    rfm = remove_outliers_iqr(rfm)
+    sources = resolve_sources(data_path)
+    data_path = sources[0]
+    if len(sources) > 1 and typed:
+        raise ValueError("--typed reads a single file; drop it to ingest several files")
     
-    rfm_segments = calculate_rfm_scores(rfm)
-    rfm_segments = segment_customers(rfm_segments)
+    # Stage outputs are cached under keys chained from the source files'
+    # digests; see utils/stage_cache.py.
+    cache = StageCache(cache_dir, max_bytes=cache_size_mb * 2**20) if cache_dir else None
     
-    rfm_clustered, kmeans_model, scaler, cluster_labels = perform_clustering(rfm)
+    def stage_key(name, parents, modules, **params):
+        return cache.key(name, parents, modules, **params) if cache else None
     
-    rfm_segments.to_csv("outputs/rfm_segments.csv", index=False)
-    rfm_clustered.to_csv("outputs/clustered_segments.csv")
+    def run_stage(name, key, compute, rows_in=None):
+        with report.stage(name, rows_in=rows_in) as stage:
+            value = cache.cached(name, key, compute, stage) if cache else compute()
+            stage['rows_out'] = len(value[0] if isinstance(value, tuple) else value)
+        return value
     
-    with open("outputs/models/kmeans_model.pkl", "wb") as f:
-        pickle.dump(kmeans_model, f)
+    def ingest():
+        if len(sources) > 1:
+            with report.stage('aggregate_files') as stage:
+                aggregates = aggregate_customers_files(sources, jobs=jobs, dedup=dedup, stats=stage)
+                stage['rows_out'] = len(aggregates)
+        elif streaming:
+            with report.stage('aggregate_streaming') as stage:
+                aggregates = aggregate_customers_streaming(data_path, chunksize=chunksize, dedup=dedup)
+                stage['rows_out'] = len(aggregates)
+        elif jobs and not typed:
+            with report.stage('aggregate_parallel') as stage:
+                aggregates = aggregate_customers_parallel(data_path, n_jobs=jobs)
+                stage['rows_out'] = len(aggregates)
+        else:
+            if typed:
+                with report.stage('load_clean_typed') as stage:
+                    df_clean = load_clean_transactions(data_path)
+                    stage['rows_out'] = len(df_clean)
+            else:
+                with report.stage('load_data') as stage:
+                    df = load_data(data_path)
+                    stage['rows_out'] = len(df)
+                with report.stage('clean_data', rows_in=len(df)) as stage:
+                    df_clean = clean_data(df)
+                    stage['rows_out'] = len(df_clean)
+                del df
+            with report.stage('aggregate_customers', rows_in=len(df_clean)) as stage:
+                aggregates = aggregate_customers(df_clean)
+                stage['rows_out'] = len(aggregates)
+            del df_clean
+        return aggregates
     
-    with open("outputs/models/scaler.pkl", "wb") as f:
-        pickle.dump(scaler, f)
+    ingestion_mode = 'files' if len(sources) > 1 else 'streaming' if streaming else 'parallel' if jobs and not typed else 'typed' if typed else 'serial'
+    aggregates = aggregates_key = None
+    if cache:
+        with report.stage('stage_cache_lookup') as stage:
+            aggregates_key = stage_key('aggregate_customers', [cache.source_key(sources)],
+                                       [data_processing, ingestion, parallel, multi_file], ingestion=ingestion_mode)
+            aggregates = cache.load('aggregate_customers', aggregates_key)
+            stage['cache'] = 'miss' if aggregates is None else 'hit'
+            stage['rows_out'] = None if aggregates is None else len(aggregates)
+    if aggregates is None:
+        aggregates = ingest()
+        if cache:
+            cache.save('aggregate_customers', aggregates_key, aggregates)
     
-    with open("outputs/models/cluster_labels.pkl", "wb") as f:
-        pickle.dump(cluster_labels, f)
+    quantile_params = {'quantiles': quantiles, 'quantile_error': quantile_error, 'chunksize': chunksize} if quantiles == 'sketch' else {'quantiles': quantiles}
     
+    prepare_key = stage_key('prepare_rfm_data', [aggregates_key], [data_processing])
+    rfm = run_stage('prepare_rfm_data', prepare_key, lambda: transform_rfm_data(rfm_from_aggregates(aggregates)), rows_in=len(aggregates))
+    
+    def remove_outliers():
+        if quantiles == 'sketch':
+            bounds = sketch_iqr_bounds(lambda: iter_chunks(rfm, chunksize), epsilon=quantile_error)
+        else:
+            bounds = iqr_bounds(rfm)
+        return remove_outliers_iqr(rfm, bounds=bounds), bounds
+    outliers_key = stage_key('remove_outliers_iqr', [prepare_key], [data_processing, quantile_sketch], **quantile_params)
+    rfm, bounds = run_stage('remove_outliers_iqr', outliers_key, remove_outliers, rows_in=len(rfm))
+    
+    def score():
+        if quantiles == 'sketch':
+            score_edges = sketch_rfm_score_edges(lambda: iter_chunks(rfm, chunksize), epsilon=quantile_error)
+            return score_customers(rfm, score_edges), score_edges
+        return calculate_rfm_scores(rfm), rfm_score_edges(rfm)
+    scores_key = stage_key('calculate_rfm_scores', [outliers_key], [rfm_analysis, quantile_sketch], **quantile_params)
+    rfm_segments, score_edges = run_stage('calculate_rfm_scores', scores_key, score, rows_in=len(rfm))
+    
+    segments_key = stage_key('segment_customers', [scores_key], [rfm_analysis])
+    rfm_segments = run_stage('segment_customers', segments_key, lambda: segment_customers(rfm_segments), rows_in=len(rfm_segments))
+    
+    models = None
+    if k_sweep:
+        with report.stage('k_sweep', rows_in=len(rfm)) as stage:
+            sweep_results, models = sweep_k(scale_rfm(rfm)[0], n_jobs=sweep_jobs,
+                                            silhouette_sample_size=silhouette_sample_size, early_stop=early_stop,
+                                            engine=engine, batch_size=batch_size)
+            sweep_results.to_csv("outputs/k_sweep.csv", index=False)
+            stage['rows_out'] = len(sweep_results)
+    elif os.path.exists("outputs/k_sweep.csv"):
+        # A sweep from an earlier run would look like it belongs to this one.
+        os.remove("outputs/k_sweep.csv")
+    if n_clusters == 'auto':
+        if not k_sweep:
+            raise ValueError("--n-clusters auto requires --k-sweep")
+        n_clusters = choose_k(sweep_results)
+    
+    init_centroids = None
+    if warm_start and os.path.exists("outputs/models/segmentation_model.bundle"):
+        init_centroids = load_log_centroids("outputs/models/segmentation_model.bundle")
+        if len(init_centroids) != n_clusters:
+            print(f"Previous model has {len(init_centroids)} clusters, not {n_clusters}; fitting from scratch.")
+            init_centroids = None
+    
+    streaming_engine = engine == 'streaming'
+    clustering_key = stage_key('perform_clustering', [segments_key], [clustering, labels], n_clusters=n_clusters, engine=engine,
+                               batch_size=batch_size if engine != 'kmeans' else None,
+                               chunksize=chunksize if streaming_engine else None, epochs=epochs if streaming_engine else None,
+                               k_sweep=k_sweep, init_centroids=array_digest(init_centroids))
+    rfm_clustered, kmeans_model, scaler, cluster_labels = run_stage(
+        'perform_clustering', clustering_key,
+        lambda: perform_clustering(rfm_segments, n_clusters=n_clusters, models=models, engine=engine,
+                                   batch_size=batch_size, chunksize=chunksize, epochs=epochs, init_centroids=init_centroids),
+        rows_in=len(rfm))
+    
+    with report.stage('write_outputs', rows_in=len(rfm_segments)):
+        rfm_segments.to_csv("outputs/rfm_segments.csv", index=False)
+        rfm_clustered.to_csv("outputs/clustered_segments.csv")
+        save_dashboard_summary(build_dashboard_summary(rfm_segments, rfm_clustered), "outputs/dashboard_summary.json")
+        write_output_store(rfm_clustered, "outputs/segments.sqlite")
+        
+        with open("outputs/models/kmeans_model.pkl", "wb") as f:
+            pickle.dump(kmeans_model, f)
+        
+        with open("outputs/models/scaler.pkl", "wb") as f:
+            pickle.dump(scaler, f)
+        
+        with open("outputs/models/cluster_labels.pkl", "wb") as f:
+            pickle.dump(cluster_labels, f)
+        
+        reference = reference_profile(rfm_clustered[['Recency', 'Frequency', 'Monetary']].to_numpy(), scaler.mean_, scaler.scale_, kmeans_model.cluster_centers_)
+        export_compiled_model(kmeans_model, scaler, cluster_labels, "outputs/models/segmentation_model.bundle", engine=engine, reference=reference)
+        
+        save_state("outputs/state", aggregates, rfm_segments.set_index('CustomerID'), bounds, score_edges)
+    
+    report.print_summary()
+    if report_path:
+        report.save(report_path)
     print("Analysis completed. Results saved in outputs/ directory.")
 
+def main_incremental(delta_path, report_path="outputs/run_report.json", profile_stages=(), trace_memory=False):
+    report = RunReport(profile_stages, trace_memory=trace_memory, delta_path=delta_path)
+    with report.stage('incremental_update') as stage:
+        rfm_segments, rfm_clustered, changed = incremental_update(delta_path)
+        stage['rows_out'] = len(changed)
+    
+    with report.stage('write_outputs', rows_in=len(rfm_segments)):
+        rfm_segments.to_csv("outputs/rfm_segments.csv", index=False)
+        rfm_clustered.to_csv("outputs/clustered_segments.csv")
+        save_dashboard_summary(build_dashboard_summary(rfm_segments, rfm_clustered), "outputs/dashboard_summary.json")
+        write_output_store(rfm_clustered, "outputs/segments.sqlite")
+    
+    report.print_summary()
+    if report_path:
+        report.save(report_path)
+    print(f"Incremental update completed for {len(changed)} customers. Results saved in outputs/ directory.")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the RFM and K-means customer segmentation pipeline.")
+    parser.add_argument("--data", nargs="+", default=["data/data.csv"], help="Transactions CSV; several paths or a glob such as 'data/invoices-*.csv' are parsed in --jobs worker processes and aggregated as they arrive")
+    parser.add_argument("--streaming", action="store_true", help="Aggregate the CSV chunk by chunk instead of loading it whole; memory is one chunk plus the customer table plus what --dedup keeps")
+    parser.add_argument("--chunksize", type=int, default=1_000_000, help="Rows per chunk for streaming ingestion and the streaming clustering engine")
+    parser.add_argument("--dedup", choices=DEDUP_SCOPES, default="rows", help="Cross-chunk duplicate detection for --streaming and several --data files: 'rows' keeps an 8-byte hash of every kept row (any row order); 'invoice' only keeps the rows of the invoice spanning a chunk boundary, for files whose invoices' rows are contiguous")
+    parser.add_argument("--typed", action="store_true", help="Read only the needed columns with compact dtypes and cache the cleaned table as Parquet")
+    parser.add_argument("--jobs", type=int, help="Parse, clean and aggregate the CSV in this many worker processes, sharded by CustomerID; with several --data files, the number of parse workers")
+    parser.add_argument("--n-clusters", default="4", help="Number of clusters, or 'auto' to take it from the k-sweep")
+    parser.add_argument("--k-sweep", action="store_true", help="Fit k = 2..14 and write inertia/silhouette to outputs/k_sweep.csv")
+    parser.add_argument("--sweep-jobs", type=int, help="Worker processes for the k-sweep (default: all cores)")
+    parser.add_argument("--silhouette-sample", type=int, default=10_000, help="Customers sampled per silhouette estimate")
+    parser.add_argument("--early-stop", action="store_true", help="Stop the k-sweep once an inertia elbow is found")
+    parser.add_argument("--engine", choices=ENGINES, default="kmeans", help="Clustering engine: full KMeans, MiniBatchKMeans, or chunked partial_fit")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="Mini-batch size for the minibatch/streaming engines")
+    parser.add_argument("--epochs", type=int, default=1, help="Passes over the RFM table for the streaming engine")
+    parser.add_argument("--warm-start", action="store_true", help="Initialise KMeans from the previously saved centroids")
+    parser.add_argument("--quantiles", choices=["exact", "sketch"], default="exact", help="Exact quantiles, or mergeable quantile sketches built chunk by chunk for the IQR bounds and score quintiles")
+    parser.add_argument("--quantile-error", type=float, default=0.01, help="Rank error of the quantile sketches, as a fraction of customers")
+    parser.add_argument("--delta", help="Merge this day's transactions CSV into the saved state instead of rerunning the full history")
+    parser.add_argument("--report", default="outputs/run_report.json", help="Where to write the per-stage JSON run report")
+    parser.add_argument("--profile", nargs="+", default=[], metavar="STAGE", help="Run these stages under cProfile and dump outputs/profiles/<stage>.prof")
+    parser.add_argument("--trace-memory", action="store_true", help="Record each stage's tracemalloc peak (slows the run down)")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every stage instead of loading unchanged ones from outputs/cache/stages")
+    parser.add_argument("--cache-size-mb", type=int, default=2048, help="Size limit of the stage cache; least recently used entries are evicted")
+    args = parser.parse_args()
+    if args.delta:
+        main_incremental(args.delta, report_path=args.report, profile_stages=args.profile, trace_memory=args.trace_memory)
+    else:
+        n_clusters = args.n_clusters if args.n_clusters == 'auto' else int(args.n_clusters)
+        main(data_path=args.data, streaming=args.streaming, chunksize=args.chunksize, dedup=args.dedup, typed=args.typed, jobs=args.jobs,
+             n_clusters=n_clusters, k_sweep=args.k_sweep, sweep_jobs=args.sweep_jobs,
+             silhouette_sample_size=args.silhouette_sample, early_stop=args.early_stop,
+             engine=args.engine, batch_size=args.batch_size, epochs=args.epochs, warm_start=args.warm_start,
+             quantiles=args.quantiles, quantile_error=args.quantile_error,
+             report_path=args.report, profile_stages=args.profile, trace_memory=args.trace_memory,
+             cache_dir=None if args.no_cache else "outputs/cache/stages", cache_size_mb=args.cache_size_mb)
\ No newline at end of file
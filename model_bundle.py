@@ -0,0 +1,91 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+# Layout: MAGIC, a little-endian uint32 header length, the JSON header, then
+# each array's raw bytes at a 64-byte aligned offset. The header records the
+# format version, metadata, every array's dtype/shape/offset and a SHA-256
+# over the metadata and payload, so a reader can mmap the file and hand out
+# array views without copying or unpickling anything.
+MAGIC = b"RFMSEG\x00\x01"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+def _padding(size):
+    return -size % ALIGNMENT
+
+def _checksum(metadata, arrays_meta, payload):
+    digest = hashlib.sha256(json.dumps([metadata, arrays_meta], sort_keys=True).encode())
+    digest.update(payload)
+    return digest.hexdigest()
+
+def write_model_bundle(path, arrays, metadata):
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    arrays_meta, offset = {}, 0
+    for name, array in arrays.items():
+        if array.dtype.hasobject:
+            raise ValueError(f"Array {name!r} has dtype object, which cannot be memory-mapped")
+        arrays_meta[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes + _padding(array.nbytes)
+    payload = bytearray(offset)
+    for name, array in arrays.items():
+        start = arrays_meta[name]['offset']
+        payload[start:start + array.nbytes] = array.tobytes()
+
+    header = json.dumps({
+        'format_version': FORMAT_VERSION,
+        'metadata': metadata,
+        'arrays': arrays_meta,
+        'sha256': _checksum(metadata, arrays_meta, payload),
+    }).encode()
+    header += b" " * _padding(len(MAGIC) + 4 + len(header))
+
+    # Write to a temp file and rename, so a reader watching the path never
+    # sees a half-written bundle.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+def read_model_bundle(path, verify=True):
+    # Returns ({name: read-only array view}, metadata). The views share one
+    # read-only mmap of the file, which stays valid even if the path is
+    # replaced by a newer bundle.
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a model bundle")
+    (header_size,) = struct.unpack_from("<I", buffer, len(MAGIC))
+    payload_start = len(MAGIC) + 4 + header_size
+    header = json.loads(bytes(buffer[len(MAGIC) + 4:payload_start]))
+    if header['format_version'] > FORMAT_VERSION:
+        raise ValueError(f"{path} has bundle format {header['format_version']}; this reader supports up to {FORMAT_VERSION}")
+    payload = memoryview(buffer)[payload_start:]
+    if verify and _checksum(header['metadata'], header['arrays'], payload) != header['sha256']:
+        raise ValueError(f"{path} failed its checksum; the bundle is corrupt or truncated")
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        arrays[name] = np.frombuffer(payload, dtype=dtype, count=count, offset=spec['offset']).reshape(spec['shape'])
+    return arrays, header['metadata']
+
+def save_model_bundle(kmeans_model, scaler, cluster_labels, path="outputs/models/segmentation_model.bundle", engine='kmeans', extra_arrays=None):
+    centroids = np.asarray(kmeans_model.cluster_centers_, dtype=np.float64)
+    write_model_bundle(path, {
+        'mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scale': np.asarray(scaler.scale_, dtype=np.float64),
+        'centroids': centroids,
+        **(extra_arrays or {}),
+    }, {
+        'engine': engine,
+        'features': ['Recency', 'Frequency', 'Monetary'],
+        'labels': [cluster_labels.get(c, f"Cluster {c}") for c in range(len(centroids))],
+    })
@@ -1,17 +1,37 @@
-import numpy as np
-import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-import pickle
 import os
+import numpy as np
+from compiled_model import CompiledSegmentationPredictor
+from utils.labels import CLUSTER_LABELS
+
+# pandas, sklearn and pickle are imported only on the code paths that need
+# them; a predictor loaded from the model bundle scores with NumPy alone.
+
+FEATURES = ['Recency', 'Frequency', 'Monetary']
+BUNDLE_NAME = "segmentation_model.bundle"
+
+def _with_feature_names(model, features):
+    # sklearn models fitted on a DataFrame warn when handed a bare array.
+    names = getattr(model, 'feature_names_in_', None)
+    if names is None:
+        return features
+    import pandas as pd
+    return pd.DataFrame(features, columns=names)
 
 class CustomerSegmentationPredictor:
     def __init__(self, kmeans_model=None, scaler=None):
         self.kmeans_model = kmeans_model
         self.scaler = scaler
-        self.cluster_labels = {0: 'At Risk', 1: 'Champions', 2: 'Loyal Customers', 3: 'New Customers'}
+        self.compiled = None
+        self.cluster_labels = dict(CLUSTER_LABELS)
 
-    def load_models(self, models_dir="outputs/models"):
+    def load_models(self, models_dir="outputs/models", use_bundle=True):
+        bundle_path = f"{models_dir}/{BUNDLE_NAME}"
+        if use_bundle and os.path.exists(bundle_path):
+            self.compiled = CompiledSegmentationPredictor(bundle_path)
+            self.cluster_labels = dict(enumerate(self.compiled.labels.tolist()))
+            print(f"Models loaded from {bundle_path}")
+            return
+        import pickle
         try:
             with open(f"{models_dir}/kmeans_model.pkl", "rb") as f:
                 self.kmeans_model = pickle.load(f)
@@ -33,21 +53,74 @@ class CustomerSegmentationPredictor:
         log_monetary = np.log1p(monetary)
         features = np.array([[log_recency, log_frequency, log_monetary]])
         if self.scaler is not None:
-            features = self.scaler.transform(features)
+            features = self.scaler.transform(_with_feature_names(self.scaler, features))
+        return features
+
+    def preprocess_batch(self, rfm):
+        if hasattr(rfm, 'columns'):
+            rfm = rfm[FEATURES].to_numpy(dtype=np.float64)
+        features = np.log1p(np.asarray(rfm, dtype=np.float64).reshape(-1, 3))
+        if self.scaler is not None:
+            features = self.scaler.transform(_with_feature_names(self.scaler, features))
         return features
 
     def predict_cluster(self, recency, frequency, monetary):
+        if self.compiled is not None:
+            return self.compiled.predict_cluster(recency, frequency, monetary)
         if self.kmeans_model is None:
             raise ValueError("Model not loaded. Please call load_models() first.")
         features = self.preprocess_input(recency, frequency, monetary)
-        cluster = self.kmeans_model.predict(features)[0]
+        cluster = self.kmeans_model.predict(_with_feature_names(self.kmeans_model, features))[0]
         return cluster
 
     def predict_segment(self, recency, frequency, monetary):
         cluster = self.predict_cluster(recency, frequency, monetary)
         return self.cluster_labels.get(cluster, f"Cluster {cluster}")
 
+    def predict_clusters(self, rfm):
+        if self.compiled is not None:
+            return self.compiled.predict_clusters(rfm)
+        if self.kmeans_model is None:
+            raise ValueError("Model not loaded. Please call load_models() first.")
+        return self.kmeans_model.predict(_with_feature_names(self.kmeans_model, self.preprocess_batch(rfm)))
+
+    def score(self, rfm):
+        # Returns (clusters, distances, margins): the distance to the assigned
+        # centroid in scaled space and the gap to the second-nearest one.
+        if self.compiled is not None:
+            return self.compiled.score(rfm)
+        if self.kmeans_model is None:
+            raise ValueError("Model not loaded. Please call load_models() first.")
+        distances = self.kmeans_model.transform(_with_feature_names(self.kmeans_model, self.preprocess_batch(rfm)))
+        rows = np.arange(len(distances))
+        clusters = distances.argmin(axis=1)
+        best = distances[rows, clusters]
+        distances[rows, clusters] = np.inf
+        return clusters, best, distances.min(axis=1, initial=np.inf) - best
+
+    def label_clusters(self, clusters):
+        n_clusters = len(self.compiled.labels) if self.compiled is not None else self.kmeans_model.n_clusters
+        labels = np.array([self.cluster_labels.get(c, f"Cluster {c}") for c in range(n_clusters)], dtype=object)
+        return labels[clusters]
+
+    def predict_segments(self, rfm):
+        clusters = self.predict_clusters(rfm)
+        return clusters, self.label_clusters(clusters)
+
+    def predict_chunks(self, chunks, chunksize=1_000_000):
+        # Accepts an iterable of arrays/DataFrames (e.g. pd.read_csv(..., chunksize=...))
+        # or one large array/DataFrame, which is sliced into chunksize rows.
+        import pandas as pd
+        if isinstance(chunks, (np.ndarray, pd.DataFrame)):
+            data = chunks
+            chunks = (data[start:start + chunksize] for start in range(0, len(data), chunksize))
+        for chunk in chunks:
+            clusters, labels = self.predict_segments(chunk)
+            index = chunk.index if isinstance(chunk, pd.DataFrame) else None
+            yield pd.DataFrame({'Cluster': clusters, 'Cluster_Labels': labels}, index=index)
+
 def customer_segmentation(Recency, Frequency, Monetary, kmeans_model, scaler, cluster_labels):
+    import pandas as pd
     data_recency = np.log1p(Recency)
     data_frequency = np.log1p(Frequency)
     data_monetary = np.log1p(Monetary)
@@ -0,0 +1,224 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from compiled_model import CompiledSegmentationPredictor
+from drift import DriftMonitor
+
+MODEL_PATH = "outputs/models/segmentation_model.bundle"
+
+class ModelStore:
+    # Holds the live predictor, with the drift monitor for its reference
+    # profile, and swaps in a new pair when the artifact on disk changes.
+    # Readers just take the current `live` tuple, so a swap is atomic.
+    def __init__(self, path=MODEL_PATH, poll_interval=2.0, drift_window=3600):
+        self.path = path
+        self.poll_interval = poll_interval
+        # The monitor compares the last drift_window seconds, one snapshot per poll.
+        self.drift_ticks = max(1, round(drift_window / poll_interval))
+        self.version = os.stat(path).st_mtime_ns
+        self.live = self._load()
+
+    def _load(self):
+        predictor = CompiledSegmentationPredictor(self.path)
+        return predictor, DriftMonitor.for_predictor(predictor, self.drift_ticks)
+
+    @property
+    def predictor(self):
+        return self.live[0]
+
+    @property
+    def monitor(self):
+        return self.live[1]
+
+    def refresh(self):
+        try:
+            version = os.stat(self.path).st_mtime_ns
+            if version == self.version:
+                return False
+            live = self._load()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Keeping current model, reload failed: {e}")
+            return False
+        self.live, self.version = live, version
+        return True
+
+    def watch(self):
+        def loop():
+            while True:
+                time.sleep(self.poll_interval)
+                monitor = self.monitor
+                if monitor is not None:
+                    monitor.tick()
+                if self.refresh():
+                    print(f"Reloaded model from {self.path}")
+        threading.Thread(target=loop, daemon=True).start()
+
+    def score(self, rows):
+        predictor, monitor = self.live
+        clusters, labels, distances, margins = predictor.score_segments(rows)
+        if monitor is not None:
+            monitor.observe(rows, clusters, distances)
+        return clusters, labels, distances, margins
+
+class MicroBatcher:
+    # Concurrent single-customer requests queue up here; one thread drains them
+    # in batches of up to max_batch, waiting at most max_delay for stragglers,
+    # and scores each batch with a single vectorized call.
+    def __init__(self, store, max_batch=256, max_delay=0.002):
+        self.store = store
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, row):
+        future = Future()
+        self.queue.put((row, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                clusters, labels, distances, margins = self.store.score(np.array([row for row, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), *result in zip(batch, clusters.tolist(), labels.tolist(), distances.tolist(), margins.tolist()):
+                future.set_result(result)
+
+def _checked(rows):
+    # log1p of a negative value is NaN; it would come back as "distance": NaN
+    # (not valid JSON) and poison the drift monitor's running sums.
+    if not np.isfinite(rows).all() or (rows < 0).any():
+        raise ValueError("recency, frequency and monetary must be finite and non-negative")
+    return rows
+
+def _rfm_rows(payload):
+    if 'customers' in payload:
+        rows = payload['customers']
+        if rows and isinstance(rows[0], dict):
+            rows = [[row['recency'], row['frequency'], row['monetary']] for row in rows]
+        return _checked(np.asarray(rows, dtype=np.float64).reshape(-1, 3))
+    return _checked(np.column_stack([
+        np.asarray(payload['recency'], dtype=np.float64),
+        np.asarray(payload['frequency'], dtype=np.float64),
+        np.asarray(payload['monetary'], dtype=np.float64),
+    ]))
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY, Nagle
+    # plus delayed ACKs add ~40ms to every keep-alive response.
+    disable_nagle_algorithm = True
+    store = None
+    batcher = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {'status': 'ok', 'model_version': self.store.version, 'pid': os.getpid()})
+        elif self.path == "/drift":
+            monitor = self.store.monitor
+            if monitor is None:
+                self._send_json(404, {'error': "The model bundle has no drift reference; retrain with main.py"})
+            else:
+                self._send_json(200, {**monitor.report(), 'model_version': self.store.version, 'pid': os.getpid()})
+        else:
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if self.path == "/predict":
+                row = _checked(np.array([float(payload['recency']), float(payload['frequency']), float(payload['monetary'])]))
+                cluster, segment, distance, margin = self.batcher.submit(row).result()
+                self._send_json(200, {'cluster': cluster, 'segment': segment, 'distance': distance, 'margin': margin})
+            elif self.path == "/predict/batch":
+                clusters, segments, distances, margins = self.store.score(_rfm_rows(payload))
+                self._send_json(200, {'clusters': clusters.tolist(), 'segments': segments.tolist(),
+                                      'distances': distances.tolist(), 'margins': margins.tolist()})
+            else:
+                self._send_json(404, {'error': f"Unknown path {self.path}"})
+        except (KeyError, TypeError, ValueError) as e:
+            self._send_json(400, {'error': f"Invalid request: {e}"})
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # Lets several worker processes listen on the same port; the kernel
+        # spreads connections across them.
+        if hasattr(socket, "SO_REUSEPORT"):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+def create_server(host="127.0.0.1", port=8000, model_path=MODEL_PATH, max_batch=256, max_delay=0.002, poll_interval=2.0, drift_window=3600):
+    store = ModelStore(model_path, poll_interval, drift_window)
+    store.watch()
+    handler = type("BoundScoringHandler", (ScoringHandler,), {
+        'store': store,
+        'batcher': MicroBatcher(store, max_batch, max_delay),
+    })
+    return ScoringServer((host, port), handler)
+
+def run_worker(host, port, model_path, max_batch, max_delay, poll_interval, drift_window):
+    server = create_server(host, port, model_path, max_batch, max_delay, poll_interval, drift_window)
+    server.serve_forever()
+
+def serve(host="127.0.0.1", port=8000, workers=1, model_path=MODEL_PATH, max_batch=256, max_delay=0.002, poll_interval=2.0, drift_window=3600):
+    print(f"Scoring server on http://{host}:{port} with {workers} worker(s)")
+    args = (host, port, model_path, max_batch, max_delay, poll_interval, drift_window)
+    if workers == 1:
+        run_worker(*args)
+        return
+    processes = [multiprocessing.Process(target=run_worker, args=args, daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP scoring service for customer segments.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes sharing the port")
+    parser.add_argument("--model", default=MODEL_PATH, help="Compiled model written by main.py")
+    parser.add_argument("--max-batch", type=int, default=256, help="Largest micro-batch of single requests")
+    parser.add_argument("--max-delay-ms", type=float, default=2.0, help="Longest wait to fill a micro-batch")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between checks for a new model")
+    parser.add_argument("--drift-window", type=float, default=3600, help="Seconds of traffic GET /drift compares with the training profile")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.model, args.max_batch, args.max_delay_ms / 1000, args.poll_interval, args.drift_window)
@@ -1,29 +1,169 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.metrics import silhouette_score
+from threadpoolctl import threadpool_limits
+from utils.labels import CLUSTER_LABELS
 
-def perform_clustering(rfm_data, n_clusters=4):
+ENGINES = ('kmeans', 'minibatch', 'streaming')
+
+def make_model(engine, n_clusters, random_state=42, batch_size=10_000, init=None):
+    # An explicit `init` array warm-starts from known centroids, which needs a
+    # single initialisation.
+    seeding = {} if init is None else {'init': init, 'n_init': 1}
+    if engine == 'kmeans':
+        return KMeans(n_clusters=n_clusters, random_state=random_state, **seeding)
+    if engine in ('minibatch', 'streaming'):
+        return MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, batch_size=batch_size, **seeding)
+    raise ValueError(f"Unknown clustering engine {engine!r}; expected one of {ENGINES}")
+
+def _single_threaded():
+    # Sweep workers already use every core between them; KMeans' own OpenMP
+    # and BLAS threads on top would oversubscribe the CPUs.
+    threadpool_limits(1)
+
+def _fit_k(X, k, silhouette_sample_size, random_state, engine='kmeans', batch_size=10_000):
+    kmeans = make_model(engine, k, random_state, batch_size)
+    kmeans.fit(X)
+    # Full silhouette is O(n^2); a bounded random sample keeps it O(sample^2).
+    sample_size = min(silhouette_sample_size, len(X)) if silhouette_sample_size else None
+    score = silhouette_score(X, kmeans.labels_, sample_size=sample_size, random_state=random_state)
+    return k, kmeans, kmeans.inertia_, score
+
+def find_elbow(inertia, threshold=0.1):
+    # The elbow is the last k whose successor improves inertia by less than
+    # `threshold` of the current value.
+    ks = sorted(inertia)
+    for prev, k in zip(ks, ks[1:]):
+        if (inertia[prev] - inertia[k]) / inertia[prev] < threshold:
+            return prev
+    return None
+
+def sweep_k(X, k_values=range(2, 15), silhouette_sample_size=10_000, n_jobs=None, early_stop=False, elbow_threshold=0.1, random_state=42, engine='kmeans', batch_size=10_000):
+    if engine == 'streaming':
+        raise ValueError("The k-sweep needs the scaled table in memory; use engine='minibatch' instead")
+    k_values = sorted(k_values)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    models, inertia, score = {}, {}, {}
+    executor = ProcessPoolExecutor(max_workers=n_jobs, initializer=_single_threaded) if n_jobs > 1 else None
+    try:
+        # k values run in waves of n_jobs so early stopping can act between waves.
+        for start in range(0, len(k_values), n_jobs):
+            wave = k_values[start:start + n_jobs]
+            if executor is None:
+                results = [_fit_k(X, k, silhouette_sample_size, random_state, engine, batch_size) for k in wave]
+            else:
+                futures = [executor.submit(_fit_k, X, k, silhouette_sample_size, random_state, engine, batch_size) for k in wave]
+                results = [future.result() for future in futures]
+            for k, kmeans, k_inertia, k_score in results:
+                models[k], inertia[k], score[k] = kmeans, k_inertia, k_score
+            if early_stop and find_elbow(inertia, elbow_threshold) is not None:
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    results = pd.DataFrame({'k': sorted(models)})
+    results['inertia'] = results['k'].map(inertia)
+    results['silhouette'] = results['k'].map(score)
+    results['elbow'] = results['k'] == find_elbow(inertia, elbow_threshold)
+    return results, models
+
+def choose_k(results):
+    elbow = results.loc[results['elbow'], 'k']
+    if len(elbow):
+        return int(elbow.iloc[0])
+    return int(results.loc[results['silhouette'].idxmax(), 'k'])
+
+def scale_rfm(rfm_data):
     std_scaler = StandardScaler()
     df_scaled = std_scaler.fit_transform(rfm_data[['Recency', 'Frequency', 'Monetary']])
     df_scaled = pd.DataFrame(df_scaled, columns=['Recency', 'Frequency', 'Monetary'])
     df_scaled.index = rfm_data.index
-    
-    inertia = []
-    score = []
-    for i in range(2, 15):
-        kmeans = KMeans(n_clusters=i, random_state=42)
-        kmeans.fit(df_scaled)
-        inertia.append(kmeans.inertia_)
-        score.append(silhouette_score(df_scaled, kmeans.labels_))
-    
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-    kmeans.fit(df_scaled)
-    
+    return df_scaled, std_scaler
+
+def canonical_order(centers):
+    # `centers` are (Recency, Frequency, Monetary) centroids in scaled log space.
+    # Clusters are ranked by value (F + M); with four clusters the two
+    # high-value ones split into Champions/Loyal and the two low-value ones into
+    # New/At Risk by recency, matching the ids in CLUSTER_LABELS.
+    value = centers[:, 1] + centers[:, 2]
+    by_value = np.lexsort((centers[:, 0], -value))
+    if len(centers) != len(CLUSTER_LABELS):
+        return by_value
+    champions, loyal = sorted(by_value[:2], key=lambda c: centers[c, 0])
+    new, at_risk = sorted(by_value[2:], key=lambda c: centers[c, 0])
+    return np.array([at_risk, champions, loyal, new])
+
+def canonicalize_model(kmeans):
+    # Permute the fitted centroids into canonical order so predict() returns
+    # stable ids; returns the old id -> new id mapping for existing labels.
+    order = canonical_order(kmeans.cluster_centers_)
+    kmeans.cluster_centers_ = kmeans.cluster_centers_[order]
+    remap = np.empty(len(order), dtype=np.int32)
+    remap[order] = np.arange(len(order), dtype=np.int32)
+    if hasattr(kmeans, 'labels_'):
+        kmeans.labels_ = remap[kmeans.labels_]
+    return remap
+
+def cluster_label_map(n_clusters):
+    if n_clusters == len(CLUSTER_LABELS):
+        return dict(CLUSTER_LABELS)
+    return {c: f"Cluster {c}" for c in range(n_clusters)}
+
+def scale_centroids(centroids, std_scaler):
+    # Previous centroids are kept in log space so they survive a refit of the scaler.
+    return (np.asarray(centroids, dtype=np.float64) - std_scaler.mean_) / std_scaler.scale_
+
+def iter_chunks(df, chunksize):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+def fit_streaming(chunks, n_clusters=4, epochs=1, random_state=42, batch_size=10_000, init_centroids=None):
+    # `chunks` is a callable returning a fresh iterator of RFM DataFrames, so
+    # the table is only ever held one chunk at a time: one pass fits the
+    # scaler, `epochs` passes feed MiniBatchKMeans.partial_fit, and a last
+    # pass assigns labels.
+    features = ['Recency', 'Frequency', 'Monetary']
+    std_scaler = StandardScaler()
+    for chunk in chunks():
+        std_scaler.partial_fit(chunk[features])
+    init = None if init_centroids is None else scale_centroids(init_centroids, std_scaler)
+    kmeans = make_model('streaming', n_clusters, random_state, batch_size, init)
+    for _ in range(epochs):
+        for chunk in chunks():
+            kmeans.partial_fit(std_scaler.transform(chunk[features]))
+    canonicalize_model(kmeans)
+    labels = [kmeans.predict(std_scaler.transform(chunk[features])) for chunk in chunks()]
+    return kmeans, std_scaler, np.concatenate(labels)
+
+def perform_clustering(rfm_data, n_clusters=4, models=None, engine='kmeans', batch_size=10_000, chunksize=1_000_000, epochs=1, init_centroids=None):
+    # `models` maps k to a model already fitted on scale_rfm(rfm_data), e.g.
+    # from sweep_k, so the chosen k is reused instead of refit. A warm start or
+    # a different batch size would change the fit, so those refit.
+    # `init_centroids` are log-space centroids of a previous model to warm-start from.
+    if engine == 'streaming':
+        kmeans, std_scaler, labels = fit_streaming(lambda: iter_chunks(rfm_data, chunksize), n_clusters, epochs,
+                                                   batch_size=batch_size, init_centroids=init_centroids)
+    else:
+        df_scaled, std_scaler = scale_rfm(rfm_data)
+        kmeans = (models or {}).get(n_clusters)
+        if kmeans is not None and (init_centroids is not None or kmeans.get_params().get('batch_size', batch_size) != batch_size):
+            kmeans = None
+        if kmeans is None:
+            init = None if init_centroids is None else scale_centroids(init_centroids, std_scaler)
+            kmeans = make_model(engine, n_clusters, batch_size=batch_size, init=init)
+            kmeans.fit(df_scaled)
+        canonicalize_model(kmeans)
+        labels = kmeans.labels_
+
     rfm_clustered = rfm_data.copy()
-    rfm_clustered['Cluster'] = kmeans.labels_
-    
-    cluster_label = {0: 'At Risk', 1: 'Champions', 2: 'Loyal Customers', 3: 'New Customers'}
+    rfm_clustered['Cluster'] = labels
+
+    cluster_label = cluster_label_map(n_clusters)
     rfm_clustered['Cluster_Labels'] = rfm_clustered['Cluster'].map(cluster_label)
-    
-    return rfm_clustered, kmeans, std_scaler, cluster_label
\ No newline at end of file
+
+    return rfm_clustered, kmeans, std_scaler, cluster_label
@@ -1,55 +1,243 @@
 import numpy as np
 import pandas as pd
-import warnings
-warnings.filterwarnings('ignore')
+from utils.quantile_sketch import sketch_column
 
-def load_data(file_path):
-    df = pd.read_csv(file_path, encoding='ISO-8859-1')
-    return df
+# Pin the dtypes that pandas would otherwise infer per chunk, so every chunk
+# hashes and filters exactly like the single-shot load_data frame.
+CSV_DTYPES = {'InvoiceNo': str, 'StockCode': str, 'CustomerID': 'float64', 'UnitPrice': 'float64'}
 
-def clean_data(df):
-    df.dropna(subset=['CustomerID'], inplace=True)
-    df.drop_duplicates(inplace=True)
-    df = df[~df['InvoiceNo'].str.startswith('C')]
-    df = df[~df['StockCode'].str.contains('^[a-zA-Z]', regex=True)]
-    df = df[~((df['Description'] == 'Next Day Carriage') | (df['Description'] == 'High Resolution Image'))]
-    df = df[df['UnitPrice'] > 0]
-    df["TotalPrice"] = df["Quantity"] * df["UnitPrice"]
+def load_data(file_path, dtype=None):
+    df = pd.read_csv(file_path, encoding='ISO-8859-1', dtype=dtype)
     return df
 
+def load_data_chunks(file_path, chunksize=1_000_000):
+    # CustomerID arrives as text; see parse_customer_ids.
+    return pd.read_csv(file_path, encoding='ISO-8859-1', dtype={**CSV_DTYPES, 'CustomerID': str}, chunksize=chunksize)
+
+def parse_customer_ids(ids):
+    # Converts CustomerID text to float64 and reports whether it would have
+    # been inferred as int64 (every ID an integer literal such as "12346",
+    # none missing). read_csv on the whole file gives int64 only when every
+    # chunk does, and float64 for IDs written as "12346.0".
+    integer = bool(ids.notna().all() and ids.str.fullmatch(r'[+-]?\d+').all())
+    return ids.astype('float64'), integer
+
+def row_hashes(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+def row_filter_mask(df):
+    # clean_data's predicates that look at one row at a time.
+    keep = np.array(df['CustomerID'].notna(), dtype=bool)
+    keep &= ~df['InvoiceNo'].str.startswith('C', na=False).to_numpy(dtype=bool)
+    keep &= ~df['StockCode'].str.contains('^[a-zA-Z]', regex=True, na=False).to_numpy(dtype=bool)
+    keep &= ~df['Description'].isin(['Next Day Carriage', 'High Resolution Image']).to_numpy()
+    keep &= (df['UnitPrice'] > 0).to_numpy()
+    return keep
+
+def clean_mask(df, hashes=None):
+    # Rows clean_data keeps. Duplicates are found on a 64-bit hash of each row
+    # rather than by comparing every column.
+    if hashes is None:
+        hashes = row_hashes(df)
+    return row_filter_mask(df) & ~pd.Series(hashes).duplicated().to_numpy()
+
+def clean_data(df, keep=None):
+    # Returns a new frame and leaves df untouched; the rows are copied once.
+    if keep is None:
+        keep = clean_mask(df)
+    clean = df[keep]
+    return clean.assign(TotalPrice=clean['Quantity'] * clean['UnitPrice'])
+
 def prepare_rfm_data(df):
-    df["Date"] = pd.to_datetime(df["InvoiceDate"])
-    reference_date = max(df["Date"]) + pd.DateOffset(days=1)
-    recency = (reference_date - df.groupby('CustomerID')["Date"].max()).dt.days
-    recency.name = "Recency"
-    frequency = df.groupby('CustomerID')['Date'].count()
-    frequency.name = "Frequency"
-    monetary = df.groupby('CustomerID')['TotalPrice'].sum()
-    monetary.name = "Monetary"
-    
-    recency_df = recency.reset_index()
-    recency_df.columns = ['CustomerID', 'Recency']
-    frequency_df = frequency.reset_index()
-    frequency_df.columns = ['CustomerID', 'Frequency']
-    monetary_df = monetary.reset_index()
-    monetary_df.columns = ['CustomerID', 'Monetary']
-    
-    rfm = recency_df.merge(frequency_df, on="CustomerID").merge(monetary_df, on="CustomerID")
-    rfm = rfm.set_index('CustomerID')
+    return rfm_from_aggregates(aggregate_customers(df))
+
+def aggregate_customers(df, previous=None):
+    # One factorize of CustomerID, then every per-customer metric is a single
+    # scatter over the integer codes; no per-metric groupby or merge.
+    # `previous` holds the aggregates of earlier rows (the streaming chunks
+    # read so far). bincount adds its weights in order, and the previous sums
+    # go in ahead of df's rows, so each customer's Monetary continues the same
+    # row-order sum a single pass over the file computes.
+    # That sum is uncompensated, whereas groupby().sum() uses Kahan summation:
+    # Monetary can differ from it by a few ulps (relative error ~1e-15).
+    dates = df["Date"] if "Date" in df else pd.to_datetime(df["InvoiceDate"])
+    ids = df['CustomerID'].to_numpy()
+    n_previous = 0 if previous is None else len(previous)
+    if n_previous:
+        ids = np.concatenate([previous.index.to_numpy(), ids])
+    codes, customers = pd.factorize(ids, sort=True)
+    previous_codes, codes = codes[:n_previous], codes[n_previous:]
+    valid = codes >= 0
+    date_values = dates.to_numpy()
+    has_date = valid & ~np.isnat(date_values)
+
+    last_purchase = np.full(len(customers), np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(last_purchase, codes[has_date], date_values.view(np.int64)[has_date])
+    frequency = np.bincount(codes[has_date], minlength=len(customers))
+    prices = df['TotalPrice'].to_numpy(dtype=np.float64)[valid]
+    # groupby().sum() skips NaN (a blank Quantity); adding 0.0 instead leaves
+    # the row-order sum unchanged.
+    prices = np.where(np.isnan(prices), 0.0, prices)
+    monetary_codes = codes[valid]
+    if n_previous:
+        previous_last = previous['LastPurchase'].to_numpy().astype(date_values.dtype).view(np.int64)
+        last_purchase[previous_codes] = np.maximum(last_purchase[previous_codes], previous_last)
+        frequency[previous_codes] += previous['Frequency'].to_numpy()
+        prices = np.concatenate([previous['Monetary'].to_numpy(dtype=np.float64), prices])
+        monetary_codes = np.concatenate([previous_codes, monetary_codes])
+    monetary = np.bincount(monetary_codes, weights=prices, minlength=len(customers))
+
+    return pd.DataFrame({
+        'LastPurchase': last_purchase.view(date_values.dtype),
+        'Frequency': frequency.astype(np.int64),
+        'Monetary': monetary,
+    }, index=pd.Index(customers, name='CustomerID'))
+
+def merge_customer_aggregates(*aggregates):
+    aggregates = [agg for agg in aggregates if agg is not None]
+    if len(aggregates) == 1:
+        return aggregates[0]
+    return pd.concat(aggregates).groupby(level=0).agg(
+        LastPurchase=('LastPurchase', 'max'),
+        Frequency=('Frequency', 'sum'),
+        Monetary=('Monetary', 'sum'),
+    )
+
+def rfm_from_aggregates(aggregates, reference_date=None):
+    if reference_date is None:
+        reference_date = aggregates['LastPurchase'].max() + pd.DateOffset(days=1)
+    rfm = pd.DataFrame({
+        'Recency': (reference_date - aggregates['LastPurchase']).dt.days,
+        'Frequency': aggregates['Frequency'],
+        'Monetary': aggregates['Monetary'],
+    })
+    rfm = rfm.sort_index()
+    rfm.index.name = 'CustomerID'
     return rfm
 
+DEDUP_SCOPES = ['rows', 'invoice']
+
+class SeenRows:
+    # Drops rows already kept in an earlier chunk, by their 64-bit row hash.
+    #   'rows'    - remembers every kept row's hash in sorted uint64 runs:
+    #               exact for any row order, 8 bytes per kept row.
+    #   'invoice' - for input ordered by invoice (each InvoiceNo's rows
+    #               contiguous, as in the Online Retail export). Identical rows
+    #               share their InvoiceNo, so only the invoice that runs across
+    #               the previous chunk boundary can repeat rows, and memory is
+    #               bounded by the largest invoice instead of the file.
+    # A new run is merged into the one before it while that run is at most
+    # twice its size, so there are O(log rows) runs to search.
+    def __init__(self, scope='rows'):
+        if scope not in DEDUP_SCOPES:
+            raise ValueError(f"Unknown de-duplication scope {scope!r}; expected one of {DEDUP_SCOPES}")
+        self.scope = scope
+        self.runs = []
+        self.invoice = None
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    def _seen(self, hashes):
+        # Sorted needles keep searchsorted's probes cache-friendly.
+        order = np.argsort(hashes)
+        needles = hashes[order]
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, needles), len(run) - 1)
+            found |= run[positions] == needles
+        seen = np.empty(len(hashes), dtype=bool)
+        seen[order] = found
+        return seen
+
+    def _add(self, hashes):
+        if not len(hashes):
+            return
+        self.runs.append(np.sort(hashes))
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            last = self.runs.pop()
+            # Two sorted runs: the stable sort (timsort) merges them in linear time.
+            self.runs[-1] = np.sort(np.concatenate([self.runs[-1], last]), kind='stable')
+
+    def drop_seen(self, hashes, keep, invoices=None):
+        # Clears `keep` for rows kept in an earlier chunk and remembers the
+        # rest; `keep` must already be unique within the chunk.
+        if self.scope == 'rows':
+            candidates = np.flatnonzero(keep)
+        else:
+            codes, uniques = pd.factorize(np.asarray(invoices, dtype=object), use_na_sentinel=False)
+            if (np.diff(codes) < 0).any():
+                raise ValueError("Rows are not grouped by InvoiceNo; de-duplicate by 'rows' instead")
+            candidates = np.flatnonzero(keep & (codes == 0)) if len(uniques) and uniques[0] == self.invoice else np.array([], dtype=np.intp)
+        seen = self._seen(hashes[candidates])
+        keep[candidates[seen]] = False
+        if self.scope == 'rows':
+            self._add(hashes[candidates[~seen]])
+        elif len(uniques):
+            if uniques[-1] != self.invoice:
+                self.runs, self.invoice = [], uniques[-1]
+                candidates = np.flatnonzero(keep & (codes == len(uniques) - 1))
+            else:
+                candidates = candidates[~seen]
+            self._add(hashes[candidates])
+        return keep
+
+def aggregate_customers_streaming(file_path, chunksize=1_000_000, dedup='rows'):
+    aggregates = None
+    seen_rows = SeenRows(dedup)
+    integer_ids = True
+    for chunk in load_data_chunks(file_path, chunksize=chunksize):
+        customer_ids, chunk_integer_ids = parse_customer_ids(chunk['CustomerID'])
+        chunk['CustomerID'] = customer_ids
+        integer_ids &= chunk_integer_ids
+        hashes = row_hashes(chunk)
+        # clean_mask only de-duplicates within the chunk; rows repeated across
+        # chunk boundaries are caught by the same row hashes.
+        keep = seen_rows.drop_seen(hashes, clean_mask(chunk, hashes), chunk['InvoiceNo'])
+        aggregates = aggregate_customers(clean_data(chunk, keep), aggregates)
+    if aggregates is None:
+        raise ValueError(f"No transactions found in {file_path}")
+    if integer_ids:
+        aggregates.index = aggregates.index.astype('int64')
+    return aggregates
+
+def prepare_rfm_data_streaming(file_path, chunksize=1_000_000, dedup='rows'):
+    return rfm_from_aggregates(aggregate_customers_streaming(file_path, chunksize=chunksize, dedup=dedup))
+
 def transform_rfm_data(rfm):
-    rfm['Recency'] = np.log1p(rfm['Recency'])
-    rfm['Frequency'] = np.log1p(rfm['Frequency'])
-    rfm['Monetary'] = np.log1p(rfm['Monetary'])
-    return rfm
+    return rfm.assign(
+        Recency=np.log1p(rfm['Recency']),
+        Frequency=np.log1p(rfm['Frequency']),
+        Monetary=np.log1p(rfm['Monetary']),
+    )
 
-def remove_outliers_iqr(rfm, columns=['Frequency', 'Monetary']):
+def iqr_bounds(rfm, columns=['Frequency', 'Monetary']):
+    bounds = {}
     for col in columns:
         Q1 = rfm[col].quantile(0.25)
         Q3 = rfm[col].quantile(0.75)
         IQR = Q3 - Q1
         lower_bound = Q1 - 1.5 * IQR
         upper_bound = Q3 + 1.5 * IQR
+        bounds[col] = (lower_bound, upper_bound)
         rfm = rfm[(rfm[col] >= lower_bound) & (rfm[col] <= upper_bound)]
-    return rfm
\ No newline at end of file
+    return bounds
+
+def sketch_iqr_bounds(chunks, columns=['Frequency', 'Monetary'], epsilon=0.01):
+    # Same bounds as iqr_bounds, taken from quantile sketches built one chunk
+    # at a time (one pass per column, since each column's quartiles are taken
+    # after the earlier columns' outliers are dropped).
+    bounds = {}
+    for col in columns:
+        Q1, Q3 = sketch_column(chunks, col, epsilon, bounds=bounds).quantile([0.25, 0.75])
+        IQR = Q3 - Q1
+        bounds[col] = (Q1 - 1.5 * IQR, Q3 + 1.5 * IQR)
+    return bounds
+
+def remove_outliers_iqr(rfm, columns=['Frequency', 'Monetary'], bounds=None):
+    if bounds is None:
+        bounds = iqr_bounds(rfm, columns)
+    keep = np.ones(len(rfm), dtype=bool)
+    for col, (lower_bound, upper_bound) in bounds.items():
+        keep &= ((rfm[col] >= lower_bound) & (rfm[col] <= upper_bound)).to_numpy()
+    return rfm[keep]
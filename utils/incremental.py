@@ -0,0 +1,101 @@
+import json
+import os
+import pickle
+from datetime import datetime
+import pandas as pd
+from utils.data_processing import CSV_DTYPES, load_data, clean_data, aggregate_customers, merge_customer_aggregates, rfm_from_aggregates, transform_rfm_data, remove_outliers_iqr
+from utils.rfm_analysis import score_rfm, rfm_score, assign_segments
+from utils.ingestion import file_digest
+
+STATE_FILES = {
+    'aggregates': 'customer_aggregates.pkl',
+    'segments': 'rfm_segments.pkl',
+    'population': 'population.pkl',
+    'applied_deltas': 'applied_deltas.json',
+}
+
+def save_state(state_dir, aggregates, segments, iqr_bounds, score_edges, applied_deltas=None):
+    # A full run starts a new state with no deltas applied.
+    os.makedirs(state_dir, exist_ok=True)
+    aggregates.to_pickle(os.path.join(state_dir, STATE_FILES['aggregates']))
+    segments.to_pickle(os.path.join(state_dir, STATE_FILES['segments']))
+    population = {'iqr_bounds': iqr_bounds, 'score_edges': score_edges}
+    with open(os.path.join(state_dir, STATE_FILES['population']), "wb") as f:
+        pickle.dump(population, f)
+    with open(os.path.join(state_dir, STATE_FILES['applied_deltas']), "w") as f:
+        json.dump(applied_deltas or {}, f, indent=2)
+
+def load_applied_deltas(state_dir):
+    # SHA-256 of every delta file merged since the last full run.
+    path = os.path.join(state_dir, STATE_FILES['applied_deltas'])
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def load_state(state_dir):
+    aggregates = pd.read_pickle(os.path.join(state_dir, STATE_FILES['aggregates']))
+    segments = pd.read_pickle(os.path.join(state_dir, STATE_FILES['segments']))
+    with open(os.path.join(state_dir, STATE_FILES['population']), "rb") as f:
+        population = pickle.load(f)
+    return aggregates, segments, population
+
+def update_aggregates(aggregates, delta):
+    delta.index = delta.index.astype(aggregates.index.dtype)
+    return merge_customer_aggregates(aggregates, delta), delta.index
+
+def update_segments(aggregates, previous, changed, population):
+    # Recency moves for every customer with the reference date; frequency and
+    # monetary only move for customers present in the delta, so everyone else
+    # keeps the scores they were given against the frozen population edges.
+    rfm = rfm_from_aggregates(aggregates)
+    rfm = transform_rfm_data(rfm)
+    rfm = remove_outliers_iqr(rfm, bounds=population['iqr_bounds'])
+
+    scores = score_rfm(rfm, population['score_edges'], columns=['Recency'])
+
+    is_changed = rfm.index.isin(changed) | ~rfm.index.isin(previous.index)
+    rescored = score_rfm(rfm.loc[is_changed], population['score_edges'], columns=['Frequency', 'Monetary'])
+    for col in ['frequency_score', 'monetary_score']:
+        carried = previous[col].reindex(rfm.index)
+        carried.loc[is_changed] = rescored[col]
+        scores[col] = carried
+    rfm = rfm.assign(**scores)
+    rfm = rfm.assign(RFM_SCORE=rfm_score(rfm))
+    return assign_segments(rfm)
+
+def assign_clusters(rfm_segments, kmeans_model, scaler, cluster_labels):
+    columns = ['Recency', 'Frequency', 'Monetary']
+    features = pd.DataFrame(scaler.transform(rfm_segments[columns]), columns=columns, index=rfm_segments.index)
+    rfm_clustered = rfm_segments.copy()
+    rfm_clustered['Cluster'] = kmeans_model.predict(features)
+    rfm_clustered['Cluster_Labels'] = rfm_clustered['Cluster'].map(cluster_labels)
+    return rfm_clustered
+
+def incremental_update(delta_path, state_dir="outputs/state", models_dir="outputs/models"):
+    # Merging is additive, so applying the same file twice would double-count
+    # its customers' Frequency and Monetary.
+    digest = file_digest(delta_path)
+    applied_deltas = load_applied_deltas(state_dir)
+    if digest in applied_deltas:
+        applied = applied_deltas[digest]
+        raise ValueError(f"{delta_path} was already applied to {state_dir} (as {applied['path']} at {applied['applied_at']})")
+    aggregates, previous, population = load_state(state_dir)
+    # Pinned dtypes: a day without cancellations would otherwise read InvoiceNo
+    # as integers, which clean_data's string filters cannot handle.
+    delta = aggregate_customers(clean_data(load_data(delta_path, dtype=CSV_DTYPES)))
+    aggregates, changed = update_aggregates(aggregates, delta)
+    segments = update_segments(aggregates, previous, changed, population)
+
+    with open(f"{models_dir}/kmeans_model.pkl", "rb") as f:
+        kmeans_model = pickle.load(f)
+    with open(f"{models_dir}/scaler.pkl", "rb") as f:
+        scaler = pickle.load(f)
+    with open(f"{models_dir}/cluster_labels.pkl", "rb") as f:
+        cluster_labels = pickle.load(f)
+
+    rfm_segments = segments.reset_index()
+    rfm_clustered = assign_clusters(rfm_segments, kmeans_model, scaler, cluster_labels)
+    applied_deltas[digest] = {'path': delta_path, 'applied_at': datetime.now().isoformat(timespec='seconds')}
+    save_state(state_dir, aggregates, segments, population['iqr_bounds'], population['score_edges'], applied_deltas)
+    return rfm_segments, rfm_clustered, changed
@@ -0,0 +1,84 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from utils.data_processing import parse_customer_ids
+
+COLUMNS = ['InvoiceNo', 'StockCode', 'Description', 'Quantity', 'InvoiceDate', 'UnitPrice', 'CustomerID']
+DTYPES = {
+    'InvoiceNo': 'category',
+    'StockCode': 'category',
+    'Description': 'category',
+    'Quantity': 'int32',
+    'InvoiceDate': str,
+    'UnitPrice': 'float32',
+    'CustomerID': str,
+}
+DATE_FORMAT = '%m/%d/%Y %H:%M'
+# Bump when the cleaning rules or the cached schema change.
+CACHE_VERSION = 2
+
+def file_digest(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_transactions(file_path, date_format=DATE_FORMAT):
+    df = pd.read_csv(file_path, encoding='ISO-8859-1', usecols=COLUMNS, dtype=DTYPES)
+    df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'], format=date_format)
+    # CustomerID gets the dtype load_data would infer, so the output CSVs
+    # write the IDs the same way.
+    customer_ids, integer_ids = parse_customer_ids(df['CustomerID'])
+    df['CustomerID'] = customer_ids.astype('int64') if integer_ids else customer_ids
+    return df
+
+def _category_mask(series, matches):
+    # Evaluate string predicates once per distinct category, then broadcast the
+    # result to the rows through the integer codes.
+    codes = series.cat.codes.to_numpy()
+    return np.where(codes >= 0, np.asarray(matches, dtype=bool)[codes], False)
+
+def _widen_prices(prices):
+    # Prices are stored as float32; widen them through their shortest decimal
+    # repr so 2.55 becomes the same float64 that parsing the CSV would give.
+    uniques, inverse = np.unique(prices, return_inverse=True)
+    widened = np.array([float(str(price)) for price in uniques], dtype=np.float64)
+    return widened[inverse]
+
+def clean_transactions(df):
+    df = df.dropna(subset=['CustomerID']).drop_duplicates()
+    invoice = df['InvoiceNo'].cat.categories
+    stock = df['StockCode'].cat.categories
+    description = df['Description'].cat.categories
+    drop = (
+        _category_mask(df['InvoiceNo'], invoice.str.startswith('C'))
+        | _category_mask(df['StockCode'], stock.str.contains('^[a-zA-Z]', regex=True))
+        | _category_mask(df['Description'], description.isin(['Next Day Carriage', 'High Resolution Image']))
+        | ~(df['UnitPrice'] > 0).to_numpy()
+    )
+    df = df[~drop]
+    return pd.DataFrame({
+        'InvoiceNo': df['InvoiceNo'].cat.remove_unused_categories(),
+        'StockCode': df['StockCode'].cat.remove_unused_categories(),
+        'Description': df['Description'].cat.remove_unused_categories(),
+        'Quantity': df['Quantity'],
+        'UnitPrice': df['UnitPrice'],
+        'CustomerID': df['CustomerID'],
+        'Date': df['InvoiceDate'],
+        'TotalPrice': df['Quantity'].to_numpy(dtype=np.float64) * _widen_prices(df['UnitPrice'].to_numpy()),
+    }, index=df.index)
+
+def load_clean_transactions(file_path, cache_dir="outputs/cache", date_format=DATE_FORMAT):
+    key = hashlib.sha256(f"{file_digest(file_path)}:{date_format}:{CACHE_VERSION}".encode()).hexdigest()
+    cache_path = os.path.join(cache_dir, f"transactions-{key[:32]}.parquet")
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path)
+
+    df = clean_transactions(read_transactions(file_path, date_format=date_format))
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, cache_path)
+    return df
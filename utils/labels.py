@@ -0,0 +1,4 @@
+# Canonical id -> label for four clusters; ids are assigned from the centroids
+# by clustering.canonical_order, so they no longer depend on KMeans' random
+# ordering. Kept free of heavy imports so prediction code can use it cheaply.
+CLUSTER_LABELS = {0: 'At Risk', 1: 'Champions', 2: 'Loyal Customers', 3: 'New Customers'}
@@ -0,0 +1,94 @@
+import json
+import os
+import sqlite3
+import pandas as pd
+
+# One row per customer, keyed on CustomerID, with secondary indexes on
+# segment and Cluster: a point lookup is a single B-tree probe and a segment
+# or cluster scan reads only that group's rows, instead of parsing the whole
+# clustered_segments.csv.
+TABLE = 'customers'
+COLUMNS = {
+    'CustomerID': 'REAL PRIMARY KEY',
+    'Recency': 'REAL',
+    'Frequency': 'REAL',
+    'Monetary': 'REAL',
+    'recency_score': 'INTEGER',
+    'frequency_score': 'INTEGER',
+    'monetary_score': 'INTEGER',
+    'RFM_SCORE': 'INTEGER',
+    'segment': 'TEXT',
+    'Cluster': 'INTEGER',
+    'Cluster_Labels': 'TEXT',
+}
+INDEXES = {'idx_segment': 'segment', 'idx_cluster': 'Cluster'}
+PYTHON_TYPES = {'REAL': float, 'INTEGER': int, 'TEXT': str}
+
+def _column_values(rfm_clustered, column):
+    kind = PYTHON_TYPES[COLUMNS[column].split()[0]]
+    values = rfm_clustered[column]
+    if kind is str:
+        return values.astype(str).tolist()
+    return values.astype(kind).tolist()
+
+def write_output_store(rfm_clustered, path="outputs/segments.sqlite"):
+    # Build into a temp file and rename, so readers holding the old store
+    # keep a consistent snapshot and new readers never see a partial one.
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    columns = list(COLUMNS)
+    rows = zip(*[_column_values(rfm_clustered, column) for column in columns])
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        definition = ", ".join(f"{column} {kind}" for column, kind in COLUMNS.items())
+        conn.execute(f"CREATE TABLE {TABLE} ({definition}) WITHOUT ROWID")
+        conn.executemany(f"INSERT INTO {TABLE} VALUES ({', '.join('?' * len(columns))})", rows)
+        for name, column in INDEXES.items():
+            conn.execute(f"CREATE INDEX {name} ON {TABLE} ({column})")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+class OutputStore:
+    def __init__(self, path="outputs/segments.sqlite"):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; run main.py first")
+        self.path = path
+        # Read-only, and shareable across the dashboard's request threads.
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+
+    def customer(self, customer_id):
+        row = self.conn.execute(f"SELECT * FROM {TABLE} WHERE CustomerID = ?", (float(customer_id),)).fetchone()
+        return dict(row) if row is not None else None
+
+    def customers(self, customer_ids):
+        ids = [float(customer_id) for customer_id in customer_ids]
+        query = f"SELECT * FROM {TABLE} WHERE CustomerID IN (SELECT value FROM json_each(?)) ORDER BY CustomerID"
+        return self._frame(query, (json.dumps(ids),))
+
+    def segment(self, segment):
+        return self._frame(f"SELECT * FROM {TABLE} WHERE segment = ? ORDER BY CustomerID", (segment,))
+
+    def cluster(self, cluster):
+        return self._frame(f"SELECT * FROM {TABLE} WHERE Cluster = ? ORDER BY CustomerID", (int(cluster),))
+
+    def segment_counts(self):
+        rows = self.conn.execute(f"SELECT segment, COUNT(*) FROM {TABLE} GROUP BY segment").fetchall()
+        return {segment: count for segment, count in rows}
+
+    def _frame(self, query, params):
+        return pd.read_sql_query(query, self.conn, params=params)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,100 @@
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from utils.data_processing import CSV_DTYPES, parse_customer_ids, row_hashes, row_filter_mask, aggregate_customers
+
+# Two-phase, shared-nothing ingestion:
+#   map    - each task parses one newline-aligned byte range of the CSV,
+#            applies clean_data's row-wise filters, groups the surviving
+#            rows by hash(CustomerID) into n_shards shards and writes them to
+#            one .npy file in a temp directory (32 bytes per row);
+#   reduce - each shard reads its slice of every map file in file order,
+#            drops duplicate rows and aggregates its customers.
+# Only file paths, shard offsets and the per-customer aggregates pass through
+# the parent process, so its memory does not grow with the file.
+# Identical rows share a CustomerID and so land in the same shard, and every
+# customer's rows keep their file order, so the merged aggregates match the
+# serial clean_data + aggregate_customers path exactly. Fields must not
+# contain embedded newlines.
+
+def split_byte_ranges(file_path, n_ranges):
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        boundaries = [f.tell()]
+        for i in range(1, n_ranges):
+            f.seek(max(size * i // n_ranges, boundaries[-1]))
+            f.readline()
+            boundaries.append(min(f.tell(), size))
+    boundaries.append(size)
+    names = header.decode('ISO-8859-1').strip().split(',')
+    return names, [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+def shard_of(customer_ids, n_shards):
+    return (pd.util.hash_array(np.asarray(customer_ids, dtype=np.float64)) % np.uint64(n_shards)).astype(np.intp)
+
+def read_range(file_path, start, end, names, invoices=False):
+    # CustomerID, Date, TotalPrice and RowHash of the rows in one byte range
+    # that pass clean_data's row-wise filters, and whether every CustomerID
+    # was an integer literal (see parse_customer_ids). invoices=True adds
+    # InvoiceNo for SeenRows' 'invoice' scope.
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    df = pd.read_csv(io.BytesIO(data), header=None, names=names, encoding='ISO-8859-1', dtype={**CSV_DTYPES, 'CustomerID': str})
+    customer_ids, integer_ids = parse_customer_ids(df['CustomerID'])
+    df['CustomerID'] = customer_ids
+    hashes = row_hashes(df)
+    keep = row_filter_mask(df)
+    df, hashes = df[keep], hashes[keep]
+    piece = pd.DataFrame({
+        'CustomerID': df['CustomerID'].to_numpy(),
+        'Date': pd.to_datetime(df['InvoiceDate']).to_numpy(),
+        'TotalPrice': (df['Quantity'] * df['UnitPrice']).to_numpy(),
+        'RowHash': hashes,
+    })
+    if invoices:
+        piece['InvoiceNo'] = df['InvoiceNo'].to_numpy()
+    return piece, integer_ids
+
+def map_range(file_path, start, end, names, n_shards, spill_path):
+    # Writes the range's rows to spill_path ordered by shard (file order within
+    # a shard); shard i is rows offsets[i]:offsets[i + 1].
+    piece, integer_ids = read_range(file_path, start, end, names)
+    shards = shard_of(piece['CustomerID'], n_shards)
+    order = np.argsort(shards, kind='stable')
+    records = np.empty(len(piece), dtype=[(name, piece[name].dtype) for name in piece.columns])
+    for name in piece.columns:
+        records[name] = piece[name].to_numpy()[order]
+    np.save(spill_path, records)
+    offsets = np.searchsorted(shards[order], np.arange(n_shards + 1))
+    return spill_path, offsets.tolist(), integer_ids
+
+def reduce_shard(spills, shard):
+    pieces = [np.load(path, mmap_mode='r')[offsets[shard]:offsets[shard + 1]]
+              for path, offsets in spills if offsets[shard + 1] > offsets[shard]]
+    records = np.concatenate(pieces) if pieces else np.load(spills[0][0])[:0]
+    shard_rows = pd.DataFrame({name: records[name] for name in records.dtype.names})
+    shard_rows = shard_rows[~shard_rows['RowHash'].duplicated().to_numpy()]
+    return aggregate_customers(shard_rows)
+
+def aggregate_customers_parallel(file_path, n_jobs=None, n_shards=None, ranges_per_job=4, spill_dir=None):
+    # spill_dir is where the map files' temp directory goes (default: the
+    # system temp dir); it needs 32 bytes per cleaned row.
+    n_jobs = n_jobs or os.cpu_count() or 1
+    n_shards = n_shards or n_jobs
+    names, ranges = split_byte_ranges(file_path, n_jobs * ranges_per_job)
+    with tempfile.TemporaryDirectory(prefix="rfm-shards-", dir=spill_dir) as tmp, ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        tasks = [(file_path, start, end, names, n_shards, os.path.join(tmp, f"range-{i:05d}.npy")) for i, (start, end) in enumerate(ranges)]
+        mapped = list(executor.map(map_range, *zip(*tasks)))
+        spills = [(path, offsets) for path, offsets, _ in mapped]
+        # Shards only exchange their customers' rows; pieces stay in file order.
+        reduced = executor.map(reduce_shard, [spills] * n_shards, range(n_shards))
+        aggregates = pd.concat(list(reduced)).sort_index()
+    if all(integer_ids for _, _, integer_ids in mapped):
+        aggregates.index = aggregates.index.astype('int64')
+    aggregates.index.name = 'CustomerID'
+    return aggregates
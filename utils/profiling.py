@@ -0,0 +1,84 @@
+import cProfile
+import json
+import os
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_rss_mb():
+    # High-water mark of the process so far; Linux reports KiB, macOS bytes.
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+class RunReport:
+    # Collects one record per pipeline stage: wall and CPU time, the process
+    # peak RSS after the stage, optionally the tracemalloc peak during it, and
+    # the row counts going in and out. Stages named in `profile_stages` are
+    # also run under cProfile and dumped to `profile_dir/<stage>.prof`.
+    def __init__(self, profile_stages=(), profile_dir="outputs/profiles", trace_memory=False, **params):
+        self.profile_stages = set(profile_stages)
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.params = params
+        self.stages = []
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+        profiler = cProfile.Profile() if name in self.profile_stages else None
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler:
+                profiler.disable()
+            record['wall_s'] = round(time.perf_counter() - wall, 4)
+            record['cpu_s'] = round(time.process_time() - cpu, 4)
+            record['peak_rss_mb'] = peak_rss_mb()
+            if self.trace_memory:
+                record['traced_peak_mb'] = round((tracemalloc.get_traced_memory()[1] - traced_before) / 2**20, 1)
+            if profiler:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                record['profile'] = os.path.join(self.profile_dir, f"{name}.prof")
+                profiler.dump_stats(record['profile'])
+            self.stages.append(record)
+
+    def to_dict(self):
+        return {
+            'started_at': self.started_at.isoformat(),
+            'total_wall_s': round(time.perf_counter() - self.start, 4),
+            'peak_rss_mb': peak_rss_mb(),
+            'params': self.params,
+            'stages': self.stages,
+        }
+
+    def save(self, path="outputs/run_report.json"):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+    def print_summary(self):
+        print(f"{'stage':<24} {'wall (s)':>9} {'cpu (s)':>9} {'rows in':>11} {'rows out':>11} {'peak RSS (MB)':>14}")
+        for record in self.stages:
+            rows_in = '' if record['rows_in'] is None else f"{record['rows_in']:,}"
+            rows_out = '' if record['rows_out'] is None else f"{record['rows_out']:,}"
+            print(f"{record['stage']:<24} {record['wall_s']:>9.3f} {record['cpu_s']:>9.3f} {rows_in:>11} {rows_out:>11} {record['peak_rss_mb'] or '':>14}")
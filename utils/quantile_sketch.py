@@ -0,0 +1,86 @@
+import numpy as np
+
+class QuantileSketch:
+    # KLL-style quantile sketch. Level h holds items that each stand for 2**h
+    # inputs; when a level outgrows its capacity it is sorted and every other
+    # item (random offset) is promoted to the level above. Memory stays around
+    # 2/epsilon items however many values are added, sketches built on
+    # different chunks or processes merge by concatenating their levels, and
+    # quantiles are off by roughly epsilon * n in rank.
+    def __init__(self, epsilon=0.01, seed=None):
+        self.epsilon = epsilon
+        self.k = max(int(np.ceil(2 / epsilon)), 8)
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(self.levels[level])
+                # An odd item out stays behind so the total weight stays n.
+                leftover, items = items[len(items) - len(items) % 2:], items[:len(items) - len(items) % 2]
+                promoted = items[self.rng.integers(2)::2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                self.levels[level] = leftover
+            level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        if self.n == 0:
+            raise ValueError("Cannot take quantiles of an empty sketch")
+        q = np.asarray(q, dtype=np.float64)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        ranks = np.searchsorted(cumulative, q * self.n, side='left').clip(0, len(items) - 1)
+        # The extremes are tracked exactly.
+        return np.where(q <= 0, self.min, np.where(q >= 1, self.max, items[ranks]))
+
+    def __len__(self):
+        return self.n
+
+def sketch_column(chunks, column, epsilon=0.01, bounds=None, seed=42):
+    # `chunks` is a callable returning a fresh iterator of RFM DataFrames.
+    # `bounds` drops rows outside earlier columns' (lower, upper) bounds first.
+    sketch = QuantileSketch(epsilon, seed=seed)
+    for chunk in chunks():
+        if bounds:
+            keep = np.ones(len(chunk), dtype=bool)
+            for col, (lower_bound, upper_bound) in bounds.items():
+                keep &= ((chunk[col] >= lower_bound) & (chunk[col] <= upper_bound)).to_numpy()
+            chunk = chunk[keep]
+        sketch.update(chunk[column].to_numpy())
+    return sketch
@@ -1,25 +1,112 @@
+import numpy as np
 import pandas as pd
+from utils.quantile_sketch import sketch_column
+
+RECENCY_LABELS = [5, 4, 3, 2, 1]
+SCORE_LABELS = [1, 2, 3, 4, 5]
+QUINTILES = [0, 0.2, 0.4, 0.6, 0.8, 1]
+
+SEGMENT_MAP = {
+    r'[1-2][1-2]': 'hibernating',
+    r'[1-2][3-4]': 'at_Risk',
+    r'[1-2]5': 'cant_loose',
+    r'3[1-2]': 'about_to_sleep',
+    r'33': 'need_attention',
+    r'[3-4][4-5]': 'loyal_customers',
+    r'41': 'promising',
+    r'51': 'new_customers',
+    r'[4-5][2-3]': 'potential_loyalists',
+    r'5[4-5]': 'champions'
+}
+SEGMENTS = list(dict.fromkeys(SEGMENT_MAP.values()))
+
+def _build_segment_table():
+    # Run the regex map once over the 25 possible "RF" scores; scoring then
+    # maps each (recency_score, frequency_score) pair through this table.
+    scores = pd.Series([f"{r}{f}" for r in range(1, 6) for f in range(1, 6)])
+    names = scores.replace(SEGMENT_MAP, regex=True)
+    return np.array([SEGMENTS.index(name) for name in names], dtype=np.int8).reshape(5, 5)
+
+SEGMENT_TABLE = _build_segment_table()
+
+def quintile_edges(values):
+    # Same edges pd.qcut(values, 5) would use.
+    edges = np.quantile(values, QUINTILES)
+    if len(np.unique(edges)) != len(edges):
+        raise ValueError(f"Bin edges must be unique: {edges!r}")
+    return edges
+
+def _quintile_codes(values, edges):
+    # qcut bins are right-closed, so value v falls in the first bin whose upper
+    # edge is >= v.
+    return np.searchsorted(edges[1:-1], values, side='left')
 
 def calculate_rfm_scores(rfm):
-    rfm["recency_score"] = pd.qcut(rfm['Recency'], 5, labels=[5, 4, 3, 2, 1])
-    rfm["frequency_score"] = pd.qcut(rfm['Frequency'].rank(method="first"), 5, labels=[1, 2, 3, 4, 5])
-    rfm["monetary_score"] = pd.qcut(rfm['Monetary'], 5, labels=[1, 2, 3, 4, 5])
-    rfm["RFM_SCORE"] = (rfm['recency_score'].astype(str) + rfm['frequency_score'].astype(str))
-    return rfm
+    recency = rfm['Recency'].to_numpy()
+    frequency = rfm['Frequency'].to_numpy()
+    monetary = rfm['Monetary'].to_numpy()
+
+    # rank(method="first") is each value's position in a stable sort.
+    frequency_rank = np.empty(len(frequency), dtype=np.float64)
+    frequency_rank[np.argsort(frequency, kind='stable')] = np.arange(1, len(frequency) + 1)
+
+    recency_codes = _quintile_codes(recency, quintile_edges(recency))
+    frequency_codes = _quintile_codes(frequency_rank, quintile_edges(frequency_rank))
+    monetary_codes = _quintile_codes(monetary, quintile_edges(monetary))
+
+    rfm = rfm.assign(
+        recency_score=pd.Categorical.from_codes(recency_codes, categories=RECENCY_LABELS, ordered=True),
+        frequency_score=pd.Categorical.from_codes(frequency_codes, categories=SCORE_LABELS, ordered=True),
+        monetary_score=pd.Categorical.from_codes(monetary_codes, categories=SCORE_LABELS, ordered=True),
+    )
+    return rfm.assign(RFM_SCORE=rfm_score(rfm))
+
+def rfm_score(rfm):
+    # The two-digit "RF" score as an integer, e.g. recency 4 and frequency 3 -> 43.
+    return rfm['recency_score'].astype(np.int64) * 10 + rfm['frequency_score'].astype(np.int64)
+
+def rfm_score_edges(rfm):
+    recency_edges = quintile_edges(rfm['Recency'].to_numpy())
+    monetary_edges = quintile_edges(rfm['Monetary'].to_numpy())
+    # Frequency is binned on its rank, so translate the rank cut points back to
+    # the frequency value sitting at each cut; ties land in the lower bin.
+    frequency = np.sort(rfm['Frequency'].to_numpy())
+    rank_edges = quintile_edges(np.arange(1, len(frequency) + 1))
+    frequency_edges = frequency[np.floor(rank_edges).astype(int).clip(1, len(frequency)) - 1]
+    return {'Recency': recency_edges, 'Frequency': frequency_edges, 'Monetary': monetary_edges}
+
+def sketch_rfm_score_edges(chunks, epsilon=0.01):
+    # rfm_score_edges from quantile sketches built one chunk at a time. The
+    # Frequency edges are value cut points, so tied frequencies share a bin
+    # instead of being split by row order; score with score_rfm.
+    edges = {}
+    for col in ['Recency', 'Frequency', 'Monetary']:
+        edges[col] = sketch_column(chunks, col, epsilon).quantile(QUINTILES)
+        if col != 'Frequency' and len(np.unique(edges[col])) != len(edges[col]):
+            raise ValueError(f"Bin edges must be unique: {edges[col]!r}")
+    return edges
+
+def score_rfm(rfm, edges, columns=['Recency', 'Frequency', 'Monetary']):
+    # Scores customers against previously saved edges (rfm_score_edges) instead
+    # of re-deriving quintiles from the population being scored.
+    scores = pd.DataFrame(index=rfm.index)
+    for col in columns:
+        labels = RECENCY_LABELS if col == 'Recency' else SCORE_LABELS
+        codes = _quintile_codes(rfm[col].to_numpy(), edges[col])
+        scores[f"{col.lower()}_score"] = pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+    return scores
+
+def score_customers(rfm, edges):
+    # Scores and segments new customers against the training population's
+    # edges, e.g. the ones saved in outputs/state/population.pkl.
+    rfm = rfm.assign(**score_rfm(rfm, edges))
+    rfm = rfm.assign(RFM_SCORE=rfm_score(rfm))
+    return assign_segments(rfm)
+
+def assign_segments(rfm):
+    score = rfm['RFM_SCORE'].to_numpy()
+    codes = SEGMENT_TABLE[score // 10 - 1, score % 10 - 1]
+    return rfm.assign(segment=pd.Categorical.from_codes(codes, categories=SEGMENTS))
 
 def segment_customers(rfm):
-    seg_map = {
-        r'[1-2][1-2]': 'hibernating',
-        r'[1-2][3-4]': 'at_Risk',
-        r'[1-2]5': 'cant_loose',
-        r'3[1-2]': 'about_to_sleep',
-        r'33': 'need_attention',
-        r'[3-4][4-5]': 'loyal_customers',
-        r'41': 'promising',
-        r'51': 'new_customers',
-        r'[4-5][2-3]': 'potential_loyalists',
-        r'5[4-5]': 'champions'
-    }
-    rfm['segment'] = rfm['RFM_SCORE'].replace(seg_map, regex=True)
-    rfm.reset_index(inplace=True)
-    return rfm
\ No newline at end of file
+    return assign_segments(rfm).reset_index()
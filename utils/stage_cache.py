@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import pickle
+import numpy as np
+from utils.ingestion import file_digest
+
+# Content-addressed cache of pipeline stage outputs. A stage's key hashes its
+# name, its parameters, the source of the modules that implement it and the
+# keys of the stages it reads from, so keys chain from the source files'
+# digests: changing n_clusters only misses perform_clustering, editing the
+# segment map in rfm_analysis.py misses the scoring stages and everything
+# after them, and no stage ever hashes a DataFrame.
+# Entries are pickles; a hit refreshes the entry's mtime, and the least
+# recently used entries are evicted once the directory exceeds max_bytes.
+CACHE_VERSION = 1
+DIGESTS_FILE = "digests.json"
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+def array_digest(array):
+    # For array-valued parameters such as warm-start centroids.
+    if array is None:
+        return None
+    array = np.ascontiguousarray(array)
+    return _sha256(array.dtype.str, array.shape, array.tobytes())
+
+class StageCache:
+    def __init__(self, cache_dir="outputs/cache/stages", max_bytes=2 * 2**30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._module_digests = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self.evict()
+
+    def source_key(self, paths, **params):
+        # File digests are remembered by (path, size, mtime), so an unchanged
+        # file is not re-read just to be fingerprinted.
+        memo_path = os.path.join(self.cache_dir, DIGESTS_FILE)
+        try:
+            with open(memo_path) as f:
+                memo = json.load(f)
+        except (OSError, ValueError):
+            memo = {}
+        digests, current = [], {}
+        for path in paths:
+            stat = os.stat(path)
+            memo_key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+            current[memo_key] = memo.get(memo_key) or file_digest(path)
+            digests.append(current[memo_key])
+        # Drop the stale entries of these paths; other paths' entries stay.
+        current_paths = {key.rsplit(":", 2)[0] for key in current}
+        memo = {key: value for key, value in memo.items() if key.rsplit(":", 2)[0] not in current_paths}
+        memo.update(current)
+        tmp_path = f"{memo_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(memo, f)
+        os.replace(tmp_path, memo_path)
+        return _sha256(CACHE_VERSION, "sources", *digests, json.dumps(params, sort_keys=True, default=repr))
+
+    def _module_digest(self, module):
+        path = module.__file__
+        if path not in self._module_digests:
+            with open(path, "rb") as f:
+                self._module_digests[path] = _sha256(f.read())
+        return self._module_digests[path]
+
+    def key(self, stage, parents, modules=(), **params):
+        return _sha256(CACHE_VERSION, stage, *parents, *[self._module_digest(module) for module in modules],
+                       json.dumps(params, sort_keys=True, default=repr))
+
+    def _path(self, stage, key):
+        return os.path.join(self.cache_dir, f"{stage}-{key[:32]}.pkl")
+
+    def load(self, stage, key):
+        path = self._path(stage, key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            print(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        os.utime(path)
+        return value
+
+    def save(self, stage, key, value):
+        path = self._path(stage, key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+
+    def cached(self, stage, key, compute, record=None):
+        # Returns the cached output of `stage` for `key`, or computes and
+        # stores it; `record` (a RunReport stage) gets 'cache': 'hit'/'miss'.
+        value = self.load(stage, key)
+        if record is not None:
+            record['cache'] = 'miss' if value is None else 'hit'
+        if value is None:
+            value = compute()
+            self.save(stage, key, value)
+        return value
+
+    def evict(self, keep=None):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path != keep:
+                os.remove(path)
+                total -= size
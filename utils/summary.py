@@ -0,0 +1,50 @@
+import json
+import os
+
+def build_dashboard_summary(rfm_segments, rfm_clustered):
+    # Everything the dashboard shows is a function of these few small tables,
+    # so it can serve them without touching the per-customer rows.
+    segment_counts = rfm_segments['segment'].value_counts()
+    segment_counts = segment_counts[segment_counts > 0]
+
+    scores = rfm_segments[['recency_score', 'frequency_score']].astype(int)
+    rf_counts = scores.groupby(['recency_score', 'frequency_score']).size()
+    rf_matrix = rf_counts.unstack('frequency_score', fill_value=0).sort_index().sort_index(axis=1)
+
+    segment_summary = rfm_segments.groupby('segment', observed=True).agg({
+        'CustomerID': 'count',
+        'Recency': 'mean',
+        'Frequency': 'mean',
+        'Monetary': 'mean'
+    }).round(2)
+    segment_summary.columns = ['Count', 'Avg_Recency', 'Avg_Frequency', 'Avg_Monetary']
+    segment_summary['Percentage'] = (segment_summary['Count'] / segment_summary['Count'].sum() * 100).round(1)
+
+    cluster_counts = rfm_clustered['Cluster_Labels'].value_counts()
+    features = ['Recency', 'Frequency', 'Monetary']
+    cluster_centroids = rfm_clustered.groupby('Cluster_Labels')[features].mean()
+
+    return {
+        'total_customers': int(len(rfm_segments)),
+        'segment_counts': {str(k): int(v) for k, v in segment_counts.items()},
+        'rf_matrix': {
+            'recency_scores': [int(r) for r in rf_matrix.index],
+            'frequency_scores': [int(f) for f in rf_matrix.columns],
+            'counts': rf_matrix.to_numpy().tolist(),
+        },
+        'segment_summary': segment_summary.reset_index().to_dict('records'),
+        'cluster_counts': {str(k): int(v) for k, v in cluster_counts.items()},
+        'n_clusters': int(rfm_clustered['Cluster'].nunique()),
+        'cluster_centroids': {str(k): [float(v) for v in row] for k, row in cluster_centroids.iterrows()},
+        'feature_ranges': {col: [float(rfm_clustered[col].min()), float(rfm_clustered[col].max())] for col in features},
+    }
+
+def save_dashboard_summary(summary, path="outputs/dashboard_summary.json"):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(summary, f)
+    os.replace(tmp_path, path)
+
+def load_dashboard_summary(path="outputs/dashboard_summary.json"):
+    with open(path) as f:
+        return json.load(f)